@@ -0,0 +1,122 @@
+import tool_cache
+from sales_tools import run_reports
+
+# The turn protocol shared by the AgentX scripts (ollama_run_agentx.py,
+# ollama_run_agentx_mcp.py and agentx_batch.py): the instructions for answering
+# with tool calls, the prompts of later turns and how tool results are reported back.
+
+# Continue each turn from the context Ollama returned for the previous one, so only
+# the new input is evaluated (False = send the full prompt every turn). Ollama only
+# returns the context in its final chunk, so responses are not closed early after
+# their JSON object while it is on; with format="json" the model stops soon after anyway.
+reuse_context = True
+
+# Approximate tokens of conversation history kept in the full prompt; older steps are
+# compacted beyond it. A reused context longer than context_token_limit is dropped
+# and the next turn starts again from the full prompt with the compacted history.
+history_token_budget = 1500
+context_token_limit = 6000
+
+# Start the tool calls of a response while the model is still writing the rest of it
+# (e.g. "next_step"); the results are discarded if the finished call differs
+speculative_tools = True
+
+# Sales tools that filter by region; the others ignore it
+region_tools = ("filter_by_region", "total_sales_by_region")
+
+# Instructions that follow the history; the latest user input comes after them
+prompt_suffix = """
+
+You break down user's query into steps if needed. 
+For each step, decide if you need to use a tool, reference the context, or use user memory. 
+If you use a tool, respond ONLY with a JSON object:
+{
+  "tool": "<tool_name>",
+  "parameters": {"param1": "value1", ...},
+  "next_step": "<What to do next or ask the user next>"
+}
+To use several tools that do not depend on each other's results (e.g. the totals of two regions), respond ONLY with one JSON object listing them all; they run together:
+{
+  "tools": [{"tool": "<tool_name>", "parameters": {"param1": "value1", ...}}, ...],
+  "next_step": "<What to do next or ask the user next>"
+}
+If the task is complete, respond with:
+{
+  "complete": true,
+  "final_answer": "<your final answer to the user's overall query>"
+}
+Otherwise, answer directly with a JSON object such as {"answer": "<your answer>", "next_step": "<the next step>"}.
+
+Latest user input:
+"""
+
+def generate_turn_prompt(tool_note, current_message):
+    # Everything else is already in the model's context from the previous turns
+    note = f"[Tool Result]\n{tool_note}\n\n" if tool_note else ""
+    return f"""
+{note}Latest user input:
+{current_message}
+"""
+
+def tool_calls(tool_json):
+    # A turn names one tool ("tool") or a list of independent ones ("tools")
+    calls = tool_json.get("tools")
+    if not isinstance(calls, list):
+        calls = [tool_json]
+    return [(call.get("tool"), call.get("parameters") or {}) for call in calls if isinstance(call, dict)]
+
+def format_tool_results(calls, results):
+    # All results of a turn go into one history step
+    return "\n\n".join(f"Tool used: {tool_name}\nResult: {tool_result}"
+                       for (tool_name, _), tool_result in zip(calls, results))
+
+def run_sales_tool(tool_name, params, file, region):
+    """
+    Runs a sales tool with the file and, for the region tools, the region defaulted.
+    Sales tools are pure, so a result is reused until the file changes.
+    """
+    # Only the region tools take the default region; the others ignore any region,
+    # so their results are not keyed by it
+    if tool_name in region_tools:
+        params = {**params, "region": params.get("region", region)}
+    else:
+        params = {name: value for name, value in params.items() if name != "region"}
+    file_path = params.get("file", file)
+    key_params = {name: value for name, value in params.items() if name != "file"}
+    return tool_cache.memoize(tool_name, key_params,
+                              lambda: run_reports(file_path, [(tool_name, params)])[tool_name], file_path)
+
+class SpeculativeTools:
+    """
+    Starts the tool calls of a streaming response as soon as its "tool" and
+    "parameters" (or "tools") fields are complete. start(calls) launches them and
+    returns their futures or tasks; only calls for which is_pure(tool_name) holds
+    are started, so a discarded speculation has no side effects.
+    """
+    def __init__(self, start, is_pure=lambda tool_name: True):
+        self.start = start
+        self.is_pure = is_pure
+        self.calls = None
+        self.pending = None
+
+    def on_partial_json(self, fields):
+        if not speculative_tools or self.calls is not None:
+            return
+        if "tools" in fields or ("tool" in fields and "parameters" in fields):
+            calls = tool_calls(fields)
+            if calls and all(self.is_pure(tool_name) for tool_name, _ in calls):
+                self.calls = calls
+                self.pending = self.start(calls)
+
+    def pending_for(self, calls):
+        """
+        Returns the started futures or tasks if the finished response made the same
+        calls, otherwise cancels them and returns None.
+        """
+        if self.pending is None:
+            return None
+        if calls != self.calls:
+            for pending in self.pending:
+                pending.cancel()
+            return None
+        return self.pending
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import sys
+import time
+from rich.console import Console
+import ollama_client
+import llm_metrics
+import tool_cache
+import agent_protocol
+import ollama_run_agentx as agentx
+
+# Agent sessions run at the same time; Ollama requests are further limited to
+# ollama_client.max_in_flight
+concurrency = 4
+
+# A session that has not completed after this many turns is stopped
+max_turns = 8
+
+# Sent in place of the user's reply, so sessions continue without anyone at the keyboard
+auto_reply = "Continue with the next step; do not wait for me."
+
+# For regression runs (--deterministic): sample greedily with a fixed seed, so repeated
+# runs give the same answers and are replayed from ollama_client's response cache
+deterministic = False
+deterministic_options = {"temperature": 0, "seed": 42}
+
+console = Console()
+
+def load_queries(file_path):
+    """
+    Returns (id, query) pairs from a text file with one query per line, or from a
+    JSONL file of {"id": ..., "query": ...} objects. Blank lines and lines starting
+    with '#' are skipped.
+    """
+    queries = []
+    with open(file_path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if file_path.endswith(".jsonl"):
+                item = json.loads(line)
+                queries.append((str(item.get("id", f"q{number}")), item["query"]))
+            else:
+                queries.append((f"q{number}", line))
+    return queries
+
+async def run_session(query_id, query):
+    """
+    Runs one agent session for a query without user input and returns its result:
+    the final answer, turns taken, tool calls made and timings.
+    """
+    builder = agentx.generate_prompt_builder(agentx.grounding_blurb, agentx.user_profile, agentx.tools_desc, query)
+    result = {"id": query_id, "query": query, "completed": False, "final_answer": None,
+              "turns": 0, "tool_calls": [], "error": None}
+    context = None
+    tool_note = None
+    current_message = query
+    tool_seconds = 0.0
+    start = time.perf_counter()
+    try:
+        for turn in range(1, max_turns + 1):
+            result["turns"] = turn
+            if context is None:
+                prompt = builder.render(current_message)
+            else:
+                prompt = agent_protocol.generate_turn_prompt(tool_note, current_message)
+            tool_note = None
+            fields = {"context": context} if context else {}
+            if deterministic:
+                fields["options"] = deterministic_options
+            chunks = [chunk async for chunk in ollama_client.astream_generate(
+                prompt, agentx.model_name, format="json", stop_at_json=not agent_protocol.reuse_context,
+                label=f"{query_id} turn {turn}", **fields)]
+            response = "".join(chunk.get("response", "") for chunk in chunks)
+            final = chunks[-1] if chunks and chunks[-1].get("done") else {}
+            if agent_protocol.reuse_context:
+                context = final.get("context")
+            if context and len(context) > agent_protocol.context_token_limit:
+                context = None
+
+            tool_json = ollama_client.find_json_object(response)
+            if tool_json is not None and tool_json.get("complete"):
+                result["completed"] = True
+                result["final_answer"] = tool_json.get("final_answer", "Task complete.")
+                break
+            if tool_json is not None and ("tool" in tool_json or "tools" in tool_json):
+                calls = agent_protocol.tool_calls(tool_json)
+                tool_start = time.perf_counter()
+                tool_results = await asyncio.to_thread(agentx.execute_tools, calls)
+                tool_seconds += time.perf_counter() - tool_start
+                result["tool_calls"] += [{"turn": turn, "tool": tool_name, "parameters": params}
+                                         for tool_name, params in calls]
+                agent_reply = agent_protocol.format_tool_results(calls, tool_results)
+                tool_note = agent_reply
+                builder.add_step(current_message, agent_reply)
+                next_step = tool_json.get("next_step", "What should I do next?")
+                current_message = f"{next_step}\nUser: {auto_reply}"
+            else:
+                # A direct answer or plain text; the interactive agent would ask the user here
+                builder.add_step(current_message, response)
+                current_message = auto_reply
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    calls = [call for call in llm_metrics.calls() if (call["label"] or "").startswith(f"{query_id} turn ")]
+    result.update({
+        "wall_time": time.perf_counter() - start,
+        "llm_seconds": sum(call["wall_time"] for call in calls),
+        "tool_seconds": tool_seconds,
+        "llm_calls": len(calls),
+        "prompt_tokens": sum(call["prompt_eval_count"] or 0 for call in calls),
+        "eval_tokens": sum(call["eval_count"] or 0 for call in calls),
+    })
+    return result
+
+async def run_batch(queries, output_path):
+    """
+    Runs a session for every (id, query) pair, at most concurrency at a time, and
+    writes each result to output_path as one JSON line as soon as it finishes.
+    Returns the results in the order they finished.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(query_id, query):
+        async with semaphore:
+            return await run_session(query_id, query)
+
+    results = []
+    try:
+        with open(output_path, "w", encoding="utf-8") as f:
+            for task in asyncio.as_completed([bounded(query_id, query) for query_id, query in queries]):
+                result = await task
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+                results.append(result)
+                status = "[green]done[/green]" if result["completed"] else "[red]incomplete[/red]"
+                console.print(f"{result['id']}: {status} in {result['turns']} turns, "
+                              f"{len(result['tool_calls'])} tool calls, {result['wall_time']:.1f}s")
+    finally:
+        await ollama_client.aclose_client()
+    return results
+
+if __name__ == "__main__":
+    # Usage: python agentx_batch.py [--deterministic] <queries file> [results.jsonl] [concurrency]
+    args = [arg for arg in sys.argv[1:] if arg != "--deterministic"]
+    deterministic = len(args) < len(sys.argv) - 1
+    if not args:
+        print("Usage: python agentx_batch.py [--deterministic] <queries file> [results.jsonl] [concurrency]")
+        sys.exit(1)
+    output_path = args[1] if len(args) > 1 else "agentx_batch_results.jsonl"
+    if len(args) > 2:
+        concurrency = int(args[2])
+    queries = load_queries(args[0])
+
+    start = time.perf_counter()
+    results = asyncio.run(run_batch(queries, output_path))
+    elapsed = time.perf_counter() - start
+
+    completed = sum(result["completed"] for result in results)
+    console.print(f"[bold]{len(results)} queries ({completed} completed) in {elapsed:.1f}s: "
+                  f"{len(results) / elapsed * 60:.1f} queries/min[/bold]")
+    summary = llm_metrics.session_summary()
+    if summary["wall_time"]:
+        console.print(f"LLM calls: {summary['calls']} ({summary['cached_calls']} cached), "
+                      f"p50 {summary['wall_time']['p50']:.2f}s, p95 {summary['wall_time']['p95']:.2f}s")
+    console.print(tool_cache.format_cache_info())
+    console.print(f"Results written to {output_path}")
@@ -0,0 +1,169 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+from rich.console import Console
+from rich.table import Table
+from generate_sales_data import generate_sales_data
+import sales_cube
+import sales_index
+import sales_loader
+from sales_tools import tool_functions, render_result
+
+# File sizes (rows) benchmarked by default
+benchmark_rows = [1_000, 100_000, 1_000_000]
+data_dir = 'benchmark_data'
+baseline_file = 'benchmark_baseline.json'
+repeats = 3
+region = 'North'
+
+# A phase regresses when it is slower (or uses more memory) than the baseline by
+# more than this fraction and by more than the absolute slack below
+tolerance = 0.25
+min_seconds = 0.005
+min_bytes = 1024 * 1024
+
+console = Console()
+
+def _best(run):
+    # Fastest of several runs, which is the least disturbed by other processes
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        value = run()
+        timings.append(time.perf_counter() - start)
+    return min(timings), value
+
+def _call(name, file_path):
+    tool = tool_functions[name]
+    if name in ('filter_by_region', 'total_sales_by_region'):
+        return lambda: tool(file_path, region, structured=True)
+    return lambda: tool(file_path, structured=True)
+
+def clear_caches():
+    # Empties every in-memory cache, so the next call loads its data the way a fresh
+    # process would: frames, cubes and date indexes are read again
+    sales_loader.clear_cache()
+    sales_cube.clear_cache()
+    sales_index.clear_cache()
+
+def benchmark_tool(name, file_path):
+    """
+    Times the load, compute and render phases of one sales tool on a file and
+    measures the peak memory of a cold call. Load is the time a cold call takes
+    beyond a warm one, so it covers whichever load path the tool takes: the whole
+    frame, a column subset, the aggregate cube or the date index.
+    """
+    call = _call(name, file_path)
+
+    def cold_call():
+        clear_caches()
+        return call()
+
+    cold, _ = _best(cold_call)
+    compute, result = _best(call)
+    render, _ = _best(lambda: render_result(result))
+
+    # Memory is measured in a separate run so tracing does not slow the timings
+    clear_caches()
+    tracemalloc.start()
+    render_result(call())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'load': max(0.0, cold - compute), 'compute': compute, 'render': render, 'peak_bytes': peak}
+
+def benchmark_file(rows):
+    """
+    Returns the path of the deterministic benchmark file with the given number of rows,
+    generating it on first use.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    file_path = os.path.join(data_dir, f"sales_{rows}.csv")
+    if not os.path.exists(file_path):
+        generate_sales_data(file_path, rows)
+    return file_path
+
+def run_benchmarks(rows_list=None):
+    """
+    Benchmarks every sales tool on every file size, first on the raw rows and then
+    with the aggregate cube and date index built; results are keyed by
+    'rows/tool' and 'rows+aggregates/tool'.
+    """
+    results = {}
+    for rows in rows_list or benchmark_rows:
+        file_path = benchmark_file(rows)
+        sales_cube.drop_cube(file_path)
+        sales_index.drop_date_index(file_path)
+        for name in tool_functions:
+            results[f"{rows}/{name}"] = benchmark_tool(name, file_path)
+        sales_cube.build_cube(file_path)
+        sales_index.build_date_index(file_path)
+        for name in tool_functions:
+            results[f"{rows}+aggregates/{name}"] = benchmark_tool(name, file_path)
+        sales_cube.drop_cube(file_path)
+        sales_index.drop_date_index(file_path)
+    clear_caches()
+    return results
+
+def compare(results, baseline):
+    """
+    Returns (key, measure, baseline value, new value) for every measure that regressed.
+    """
+    regressions = []
+    for key, measures in results.items():
+        if key not in baseline:
+            continue
+        for measure, value in measures.items():
+            old = baseline[key].get(measure)
+            if old is None:
+                continue
+            slack = min_bytes if measure == 'peak_bytes' else min_seconds
+            if value > old * (1 + tolerance) and value - old > slack:
+                regressions.append((key, measure, old, value))
+    return regressions
+
+def print_results(results, baseline):
+    table = Table(title="Sales tools benchmark")
+    table.add_column("Rows / Tool", style="bold", overflow="fold")
+    for measure in ('load', 'compute', 'render'):
+        table.add_column(f"{measure} (ms)", justify="right")
+    table.add_column("peak (MB)", justify="right")
+    for key, measures in results.items():
+        old = baseline.get(key, {})
+        cells = []
+        for measure in ('load', 'compute', 'render', 'peak_bytes'):
+            scale = 1 / (1024 * 1024) if measure == 'peak_bytes' else 1000
+            cell = f"{measures[measure] * scale:.1f}"
+            if measure in old:
+                cell += f" ({old[measure] * scale:.1f})"
+            cells.append(cell)
+        table.add_row(key, *cells)
+    console.print(table)
+    if baseline:
+        console.print("[dim]Baseline values in parentheses.[/dim]")
+
+if __name__ == "__main__":
+    # Usage: python benchmark_sales_tools.py [--save-baseline] [rows ...]
+    save = '--save-baseline' in sys.argv
+    rows_list = [int(value) for value in sys.argv[1:] if value != '--save-baseline']
+    baseline = {}
+    if os.path.exists(baseline_file):
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(rows_list)
+    print_results(results, baseline)
+
+    if save:
+        with open(baseline_file, 'w') as f:
+            json.dump({**baseline, **results}, f, indent=2)
+        console.print(f"[green]Saved baseline to {baseline_file}[/green]")
+    else:
+        regressions = compare(results, baseline)
+        for key, measure, old, new in regressions:
+            console.print(f"[red]Regression: {key} {measure} {old:.4g} -> {new:.4g}[/red]")
+        if regressions:
+            sys.exit(1)
+        if baseline:
+            console.print("[green]No regressions against the baseline.[/green]")
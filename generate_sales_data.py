@@ -0,0 +1,49 @@
+import sys
+import numpy as np
+import pandas as pd
+
+# Names used first, so small generated files look like sales_data.csv
+product_names = ['Chair', 'Table', 'Lamp', 'Sofa', 'Desk', 'Bookshelf']
+region_names = ['North', 'South', 'East', 'West']
+
+# Rows generated and written at a time, bounding memory for very large files
+chunk_rows = 1_000_000
+
+def _names(base, prefix, count):
+    return base[:count] + [f"{prefix} {i}" for i in range(len(base) + 1, count + 1)]
+
+def generate_sales_data(file_path, rows, products=6, regions=4, start_date='2025-01-01', days=365, seed=42):
+    """
+    Writes a sales CSV with the columns of sales_data.csv and rows random rows.
+    The same arguments always produce the same file.
+    """
+    rng = np.random.default_rng(seed)
+    product_choices = np.array(_names(product_names, 'Product', products))
+    region_choices = np.array(_names(region_names, 'Region', regions))
+    dates = pd.date_range(start_date, periods=days).strftime('%Y-%m-%d').to_numpy()
+    written = 0
+    with open(file_path, 'w', newline='') as f:
+        f.write('Product,Region,Date,Units_Sold,Revenue\n')
+        while written < rows:
+            count = min(chunk_rows, rows - written)
+            units = rng.integers(1, 201, count)
+            chunk = pd.DataFrame({
+                'Product': product_choices[rng.integers(0, products, count)],
+                'Region': region_choices[rng.integers(0, regions, count)],
+                'Date': dates[rng.integers(0, days, count)],
+                'Units_Sold': units,
+                'Revenue': units * rng.integers(50, 1001, count),
+            })
+            chunk.to_csv(f, header=False, index=False)
+            written += count
+    return file_path
+
+if __name__ == "__main__":
+    # Usage: python generate_sales_data.py <file> <rows> [products] [regions] [seed]
+    if len(sys.argv) < 3:
+        print("Usage: python generate_sales_data.py <file> <rows> [products] [regions] [seed]")
+        sys.exit(1)
+    args = [int(value) for value in sys.argv[2:]]
+    options = dict(zip(['products', 'regions', 'seed'], args[1:]))
+    generate_sales_data(sys.argv[1], args[0], **options)
+    print(f"Wrote {args[0]} rows to {sys.argv[1]}")
@@ -0,0 +1,183 @@
+import json
+import math
+import os
+import threading
+import time
+from rich.table import Table
+
+# Every call is appended to this JSONL file when set (OLLAMA_METRICS_JSONL)
+jsonl_file = os.environ.get("OLLAMA_METRICS_JSONL")
+
+# Session aggregates are rewritten to this Prometheus text file after every call
+# when set (OLLAMA_METRICS_PROM), e.g. for the node_exporter textfile collector
+prometheus_file = os.environ.get("OLLAMA_METRICS_PROM")
+
+# Ollama reports durations in nanoseconds
+_duration_fields = ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration")
+
+_calls = []
+_lock = threading.Lock()
+
+def record(payload, final, wall_time, time_to_first_token, label=None):
+    """
+    Records the metrics of one /api/generate call from its request payload and
+    final stream chunk, and returns them. Cached calls and calls stopped early
+    (e.g. once their JSON was complete) have no Ollama timings, but the prompt
+    size and reused context length are always recorded.
+    """
+    call = {
+        "time": time.time(),
+        "model": payload["model"],
+        "label": label,
+        "prompt_chars": len(payload["prompt"]),
+        "context_tokens": len(payload.get("context") or []),
+        "cached": bool(final.get("cached")),
+        "done_reason": final.get("done_reason"),
+        "wall_time": wall_time,
+        "time_to_first_token": time_to_first_token,
+        "prompt_eval_count": final.get("prompt_eval_count"),
+        "eval_count": final.get("eval_count"),
+    }
+    for field in _duration_fields:
+        value = None if call["cached"] else final.get(field)
+        call[field.replace("_duration", "_seconds")] = None if value is None else value / 1e9
+    call["tokens_per_sec"] = _rate(call["eval_count"], call["eval_seconds"])
+    call["prompt_tokens_per_sec"] = _rate(call["prompt_eval_count"], call["prompt_eval_seconds"])
+    with _lock:
+        _calls.append(call)
+        if jsonl_file:
+            with open(jsonl_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(call) + "\n")
+        if prometheus_file:
+            _write_prometheus(prometheus_file, _summary())
+    return call
+
+def _rate(count, seconds):
+    return count / seconds if count and seconds else None
+
+def _percentile(values, fraction):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def _stats(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return {"p50": _percentile(values, 0.5), "p95": _percentile(values, 0.95),
+            "sum": sum(values), "count": len(values)}
+
+def calls():
+    """
+    Returns the metrics of every call recorded in this session.
+    """
+    with _lock:
+        return list(_calls)
+
+def _summary():
+    fresh = [call for call in _calls if not call["cached"]]
+    eval_tokens = sum(call["eval_count"] or 0 for call in fresh)
+    eval_seconds = sum(call["eval_seconds"] or 0 for call in fresh)
+    return {
+        "calls": len(_calls),
+        "cached_calls": len(_calls) - len(fresh),
+        "wall_time": _stats(call["wall_time"] for call in _calls),
+        "time_to_first_token": _stats(call["time_to_first_token"] for call in fresh),
+        "load_seconds": _stats(call["load_seconds"] for call in fresh),
+        "prompt_eval_seconds": _stats(call["prompt_eval_seconds"] for call in fresh),
+        "eval_seconds": _stats(call["eval_seconds"] for call in fresh),
+        "prompt_tokens": sum(call["prompt_eval_count"] or 0 for call in fresh),
+        "eval_tokens": eval_tokens,
+        "tokens_per_sec": eval_tokens / eval_seconds if eval_seconds else None,
+        # Growth of the prompt from one agent loop to the next
+        "prompt_tokens_per_call": [call["prompt_eval_count"] for call in _calls],
+        "prompt_chars_per_call": [call["prompt_chars"] for call in _calls],
+    }
+
+def session_summary():
+    """
+    Returns the session aggregates: p50/p95 of the timings, token totals,
+    overall tokens/sec and the prompt tokens of each call in order.
+    """
+    with _lock:
+        return _summary()
+
+def export_jsonl(path):
+    """
+    Writes the metrics of every call of the session to a JSONL file.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for call in calls():
+            f.write(json.dumps(call) + "\n")
+
+def _write_prometheus(path, summary):
+    lines = []
+    for name, help_text in (
+        ("wall_time", "Wall time of Ollama generate calls"),
+        ("time_to_first_token", "Time to the first generated token"),
+        ("load_seconds", "Time Ollama spent loading the model"),
+        ("prompt_eval_seconds", "Time Ollama spent evaluating prompts"),
+        ("eval_seconds", "Time Ollama spent generating tokens"),
+    ):
+        stats = summary[name]
+        metric = "ollama_" + name.replace("_seconds", "") + "_seconds"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} summary"]
+        if stats:
+            lines += [
+                f'{metric}{{quantile="0.5"}} {stats["p50"]}',
+                f'{metric}{{quantile="0.95"}} {stats["p95"]}',
+                f"{metric}_sum {stats['sum']}",
+                f"{metric}_count {stats['count']}",
+            ]
+    for name, kind, help_text in (
+        ("calls", "counter", "Ollama generate calls"),
+        ("cached_calls", "counter", "Calls answered from the response cache"),
+        ("prompt_tokens", "counter", "Prompt tokens evaluated by Ollama"),
+        ("eval_tokens", "counter", "Tokens generated by Ollama"),
+        ("tokens_per_sec", "gauge", "Generated tokens per second of generation time"),
+    ):
+        metric = f"ollama_{name}_total" if kind == "counter" else f"ollama_{name}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}",
+                  f"{metric} {summary[name] or 0}"]
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+
+def export_prometheus(path):
+    """
+    Writes the session aggregates to a file in the Prometheus text format.
+    """
+    _write_prometheus(path, session_summary())
+
+def _seconds(value):
+    return "-" if value is None else f"{value:.2f}"
+
+def summary_table():
+    """
+    Returns a rich Table with one row per call and the session p50/p95 below it.
+    """
+    table = Table(title="LLM calls this session")
+    for column in ("Call", "Prompt chars", "Context tok", "Prompt tok", "Prompt eval s", "Gen tok", "Tok/s",
+                   "First token s", "Total s"):
+        table.add_column(column, justify="right" if column != "Call" else "left")
+    for i, call in enumerate(calls()):
+        rate = call["tokens_per_sec"]
+        name = call["label"] or str(i + 1)
+        table.add_row(
+            name + (" (cached)" if call["cached"] else ""),
+            str(call["prompt_chars"]),
+            str(call["context_tokens"]),
+            str(call["prompt_eval_count"] or "-"),
+            _seconds(call["prompt_eval_seconds"]),
+            str(call["eval_count"] or "-"),
+            "-" if rate is None else f"{rate:.1f}",
+            _seconds(call["time_to_first_token"]),
+            _seconds(call["wall_time"]),
+        )
+    summary = session_summary()
+    for quantile in ("p50", "p95"):
+        cells = [summary[name][quantile] if summary[name] else None
+                 for name in ("prompt_eval_seconds", "time_to_first_token", "wall_time")]
+        table.add_row(quantile, "", "", "", _seconds(cells[0]), "", "", _seconds(cells[1]), _seconds(cells[2]),
+                      style="bold")
+    return table
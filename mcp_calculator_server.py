@@ -1,7 +1,7 @@
 # basic import 
 from mcp.server.fastmcp import FastMCP, Image
 from mcp.server.fastmcp.prompts import base
-from mcp.types import TextContent
+from mcp.types import TextContent, ToolAnnotations
 from mcp import types
 import math
 import sys
@@ -11,26 +11,29 @@ mcp = FastMCP("Calculator")
 
 # DEFINE TOOLS
 
+# The calculator tools are pure functions; clients may reuse their results
+pure = ToolAnnotations(readOnlyHint=True, idempotentHint=True, openWorldHint=False)
+
 #addition tool
-@mcp.tool()
+@mcp.tool(annotations=pure)
 def add(a: int, b: int) -> int:
     """Add two numbers"""
     return int(a + b)
 
 # subtraction tool
-@mcp.tool()
+@mcp.tool(annotations=pure)
 def subtract(a: int, b: int) -> int:
     """Subtract two numbers"""
     return int(a - b)
 
 # multiplication tool
-@mcp.tool()
+@mcp.tool(annotations=pure)
 def multiply(a: int, b: int) -> int:
     """Multiply two numbers"""
     return int(a * b)
 
 #  division tool
-@mcp.tool() 
+@mcp.tool(annotations=pure)
 def divide(a: int, b: int) -> float:
     """Divide two numbers"""
     return float(a / b)
@@ -0,0 +1,561 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import asyncio
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from rich.live import Live
+from rich.panel import Panel
+from rich.text import Text
+import llm_metrics
+
+# Ollama server, overridable with the OLLAMA_HOST environment variable
+base_url = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+# Model used by every script when set (OLLAMA_MODEL), instead of the script's own default
+model_override = os.environ.get("OLLAMA_MODEL")
+
+# Seconds to wait for the connection, and for each streamed chunk once connected
+connect_timeout = 5
+read_timeout = 300
+
+# Connection failures, timeouts and these statuses are retried with exponential backoff
+max_retries = 3
+retry_backoff = 0.5
+retry_statuses = (429, 502, 503, 504)
+
+# Keep-alive connections kept open to the server
+pool_size = 10
+
+# Requests the async client sends to Ollama at the same time; more wait their turn
+max_in_flight = 4
+
+# How long Ollama keeps the model loaded after a call (OLLAMA_KEEP_ALIVE), so
+# agent turns do not wait for it to be loaded again
+keep_alive = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+# On-disk cache of complete responses, keyed by a hash of model, prompt and options
+# (OLLAMA_CACHE=0 turns it off). Ollama samples at a temperature of about 0.8 by
+# default, so only calls that set temperature 0 or a seed in their options are cached.
+cache_responses = os.environ.get("OLLAMA_CACHE", "1") != "0"
+cache_dir = os.environ.get("OLLAMA_CACHE_DIR", ".ollama_cache")
+cache_max_bytes = 64 * 1024 * 1024
+
+# Request fields that do not change the generated text
+_uncached_fields = ("keep_alive",)
+
+_session = None
+_session_lock = threading.Lock()
+_async_client = None
+_async_semaphore = None
+_async_loop = None
+_cache_lock = threading.Lock()
+_cache_hits = 0
+_cache_misses = 0
+
+def resolve_model(default):
+    """
+    Returns the model to use: OLLAMA_MODEL if set, otherwise the given default.
+    """
+    return model_override or default
+
+def get_session():
+    """
+    Returns the process-wide requests Session, whose pooled keep-alive connections
+    are reused by every call to the Ollama server.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+def close_session():
+    """
+    Closes the pooled connections; the next call opens a new session.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def post(path, payload, stream=False):
+    """
+    POSTs a JSON payload to an Ollama API path such as '/api/generate' and returns the response.
+    Connection errors, timeouts and overloaded-server statuses are retried before giving up.
+    """
+    url = base_url.rstrip("/") + path
+    for attempt in range(max_retries + 1):
+        try:
+            response = get_session().post(url, json=payload, stream=stream,
+                                          timeout=(connect_timeout, read_timeout))
+            if response.status_code not in retry_statuses or attempt == max_retries:
+                response.raise_for_status()
+                return response
+            response.close()
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+        time.sleep(retry_backoff * 2 ** attempt)
+
+def _cache_key(payload, cache, stop_at_json=False):
+    options = payload.get("options") or {}
+    deterministic = options.get("temperature") == 0 or "seed" in options
+    if not (cache and cache_responses and deterministic):
+        return None
+    keyed = {name: value for name, value in payload.items() if name not in _uncached_fields}
+    if stop_at_json:
+        # A response cut short after its JSON object is cached separately from the full one
+        keyed["stop_at_json"] = True
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _cache_file(key):
+    return os.path.join(cache_dir, key + ".json")
+
+def _cache_get(key):
+    global _cache_hits, _cache_misses
+    try:
+        with open(_cache_file(key), encoding="utf-8") as f:
+            chunks = json.load(f)
+        # The modification time orders entries for LRU eviction
+        os.utime(_cache_file(key))
+    except (OSError, ValueError):
+        chunks = None
+    with _cache_lock:
+        if chunks is None:
+            _cache_misses += 1
+        else:
+            _cache_hits += 1
+    return chunks
+
+def _cache_entries():
+    try:
+        return [entry for entry in os.scandir(cache_dir) if entry.name.endswith(".json")]
+    except FileNotFoundError:
+        return []
+
+def _cache_put(key, chunks):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_file(key)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(chunks, f)
+    os.replace(path + ".tmp", path)
+    with _cache_lock:
+        entries = sorted(_cache_entries(), key=lambda entry: entry.stat().st_mtime_ns)
+        total = sum(entry.stat().st_size for entry in entries)
+        # Evict least recently used entries, never the one just written
+        for entry in entries:
+            if total <= cache_max_bytes or entry.path == path:
+                break
+            total -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+def _payload(prompt, model, fields):
+    return {"model": resolve_model(model), "prompt": prompt, "keep_alive": keep_alive, **fields}
+
+class JsonObjectParser:
+    """
+    Finds the first complete, valid JSON object in text that arrives in pieces.
+    Braces are counted outside of strings, so the text is scanned only once.
+    Until the object is complete, fields holds its top-level fields received in full
+    so far, e.g. "tool" and "parameters" while "next_step" is still being generated.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.result = None
+        self.fields = {}
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text):
+        """
+        Adds text and returns the object (a dict) once it is complete, otherwise None.
+        """
+        if self.result is not None:
+            return self.result
+        self.buffer += text
+        for i in range(self._pos, len(self.buffer)):
+            char = self.buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"' and self._depth:
+                self._in_string = True
+            elif char == "{":
+                if not self._depth:
+                    self._start = i
+                    self.fields = {}
+                self._depth += 1
+            elif char == "," and self._depth == 1:
+                # Every top-level field before this comma is complete
+                try:
+                    self.fields = json.loads(self.buffer[self._start:i] + "}")
+                except ValueError:
+                    pass
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if not self._depth:
+                    try:
+                        self.result = json.loads(self.buffer[self._start:i + 1])
+                    except ValueError:
+                        # Balanced but not JSON; keep looking after it
+                        self.fields = {}
+                        continue
+                    self.fields = self.result
+                    self._pos = i + 1
+                    return self.result
+        self._pos = len(self.buffer)
+        return None
+
+def find_json_object(text):
+    """
+    Returns the first complete JSON object in text, or None if there is none.
+    """
+    return JsonObjectParser().feed(text)
+
+# Final chunk sent in place of Ollama's when a stream is closed after its JSON object
+_json_complete = {"response": "", "done": True, "done_reason": "json_complete"}
+
+class _CallTimer:
+    # Times one streamed call and records its metrics from the final chunk
+    def __init__(self, payload, label):
+        self.payload = payload
+        self.label = label
+        self.start = time.perf_counter()
+        self.first_token = None
+
+    def seen(self, chunk):
+        if self.first_token is None and chunk.get("response"):
+            self.first_token = time.perf_counter()
+        return chunk
+
+    def finish(self, chunks):
+        final = chunks[-1] if chunks and chunks[-1].get("done") else {}
+        first = None if self.first_token is None else self.first_token - self.start
+        llm_metrics.record(self.payload, final, time.perf_counter() - self.start, first, self.label)
+
+def stream_generate(prompt, model, cache=True, stop_at_json=False, label=None, **fields):
+    """
+    Yields the JSON chunks streamed by /api/generate for a prompt; extra fields
+    (options, format, context, ...) are added to the request payload.
+    Passing the context of the previous response's final chunk continues that
+    conversation, so Ollama only evaluates the new prompt.
+    With stop_at_json the request is closed, which stops the generation, as soon
+    as the text holds a complete JSON object; pair it with format="json" or a schema.
+    A cached response is replayed without contacting Ollama; pass cache=False to
+    always generate a fresh one.
+    The timings of every call are recorded in llm_metrics under the given label.
+    """
+    payload = _payload(prompt, model, fields)
+    key = _cache_key(payload, cache, stop_at_json)
+    timer = _CallTimer(payload, label)
+    if key is not None:
+        chunks = _cache_get(key)
+        if chunks is not None:
+            chunks = chunks[:-1] + [{**chunks[-1], "cached": True}]
+            for chunk in chunks:
+                yield timer.seen(chunk)
+            timer.finish(chunks)
+            return
+    chunks = []
+    parser = JsonObjectParser() if stop_at_json else None
+    with post("/api/generate", payload, stream=True) as response:
+        for line in response.iter_lines():
+            if line:
+                chunk = _parse_line(line.decode("utf-8"))
+                chunks.append(chunk)
+                yield timer.seen(chunk)
+                if parser is not None and parser.feed(chunk.get("response", "")) is not None:
+                    break
+    if parser is not None and parser.result is not None and not chunks[-1].get("done"):
+        chunks.append(dict(_json_complete))
+        yield chunks[-1]
+    timer.finish(chunks)
+    # Only complete responses are cached
+    if key is not None and chunks and chunks[-1].get("done"):
+        _cache_put(key, chunks)
+
+def _parse_line(data):
+    try:
+        return json.loads(data)
+    except ValueError:
+        # Pass through anything the server sends that is not JSON
+        return {"response": data}
+
+def _async_state():
+    global _async_client, _async_semaphore, _async_loop
+    loop = asyncio.get_running_loop()
+    # Clients and semaphores belong to one event loop, e.g. one asyncio.run()
+    if _async_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        _async_semaphore = asyncio.Semaphore(max_in_flight)
+        _async_loop = loop
+    return _async_client, _async_semaphore
+
+async def apost(path, payload):
+    """
+    Async version of post: sends a JSON payload to an Ollama API path with the same
+    timeouts and retries, and returns the streaming response, which the caller must aclose().
+    """
+    client, _ = _async_state()
+    url = base_url.rstrip("/") + path
+    for attempt in range(max_retries + 1):
+        try:
+            response = await client.send(client.build_request("POST", url, json=payload), stream=True)
+            if response.status_code not in retry_statuses or attempt == max_retries:
+                response.raise_for_status()
+                return response
+            await response.aclose()
+        except (httpx.TransportError, httpx.TimeoutException):
+            if attempt == max_retries:
+                raise
+        await asyncio.sleep(retry_backoff * 2 ** attempt)
+
+async def astream_generate(prompt, model, cache=True, stop_at_json=False, label=None, **fields):
+    """
+    Async version of stream_generate. At most max_in_flight requests run at once,
+    and cancelling the consuming task closes the connection and stops generation.
+    """
+    payload = _payload(prompt, model, fields)
+    key = _cache_key(payload, cache, stop_at_json)
+    if key is not None:
+        chunks = _cache_get(key)
+        if chunks is not None:
+            timer = _CallTimer(payload, label)
+            chunks = chunks[:-1] + [{**chunks[-1], "cached": True}]
+            for chunk in chunks:
+                yield timer.seen(chunk)
+            timer.finish(chunks)
+            return
+    chunks = []
+    parser = JsonObjectParser() if stop_at_json else None
+    _, semaphore = _async_state()
+    async with semaphore:
+        # Timed from here, so waiting for a free slot is not counted as latency
+        timer = _CallTimer(payload, label)
+        response = await apost("/api/generate", payload)
+        try:
+            async for line in response.aiter_lines():
+                if line:
+                    chunk = _parse_line(line)
+                    chunks.append(chunk)
+                    yield timer.seen(chunk)
+                    if parser is not None and parser.feed(chunk.get("response", "")) is not None:
+                        break
+        finally:
+            await response.aclose()
+    if parser is not None and parser.result is not None and not chunks[-1].get("done"):
+        chunks.append(dict(_json_complete))
+        yield chunks[-1]
+    timer.finish(chunks)
+    if key is not None and chunks and chunks[-1].get("done"):
+        _cache_put(key, chunks)
+
+async def agenerate_response(prompt, model, **fields):
+    """
+    Async version of generate_response.
+    """
+    return "".join([chunk.get("response", "") async for chunk in astream_generate(prompt, model, **fields)])
+
+async def agenerate_all(prompts, model, **fields):
+    """
+    Generates the responses to several prompts concurrently (at most max_in_flight
+    at a time) and returns them in the order of the prompts.
+    """
+    return await asyncio.gather(*(agenerate_response(prompt, model, **fields) for prompt in prompts))
+
+async def aclose_client():
+    """
+    Closes the async client's connections.
+    """
+    global _async_client, _async_loop
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+        _async_loop = None
+
+def cache_info():
+    """
+    Returns hit/miss counts and the current size of the response cache.
+    """
+    entries = _cache_entries()
+    with _cache_lock:
+        return {
+            "hits": _cache_hits,
+            "misses": _cache_misses,
+            "entries": len(entries),
+            "bytes": sum(entry.stat().st_size for entry in entries),
+            "max_bytes": cache_max_bytes,
+        }
+
+def clear_cache():
+    """
+    Deletes every cached response.
+    """
+    with _cache_lock:
+        for entry in _cache_entries():
+            os.remove(entry.path)
+
+def generate_response(prompt, model, **fields):
+    """
+    Returns the full text generated for a prompt.
+    """
+    return "".join(chunk.get("response", "") for chunk in stream_generate(prompt, model, **fields))
+
+def stream_stats(start, first_token, end, chunks, final):
+    """
+    Returns time to first token, tokens/sec and token count for a streamed call.
+    Ollama's own eval counters from the final chunk are used when present.
+    """
+    tokens = final.get("eval_count", chunks)
+    if final.get("eval_duration"):
+        rate = tokens / (final["eval_duration"] / 1e9)
+    elif first_token is not None and end > first_token:
+        rate = tokens / (end - first_token)
+    else:
+        rate = 0.0
+    return {
+        "time_to_first_token": None if first_token is None else first_token - start,
+        "tokens_per_sec": rate,
+        "tokens": tokens,
+        "total_time": end - start,
+        "cached": final.get("cached", False),
+        "prompt_tokens": final.get("prompt_eval_count"),
+        "prompt_eval_time": final.get("prompt_eval_duration", 0) / 1e9,
+    }
+
+def format_stats(stats):
+    if stats.get("cached"):
+        return f"cached response · {stats['tokens']} tokens"
+    ttft = stats["time_to_first_token"]
+    first = "no tokens" if ttft is None else f"first token {ttft:.2f}s"
+    text = f"{first} · {stats['tokens_per_sec']:.1f} tok/s · {stats['tokens']} tok in {stats['total_time']:.2f}s"
+    if stats.get("prompt_tokens") is not None:
+        text += f" · prompt {stats['prompt_tokens']} tok in {stats['prompt_eval_time']:.2f}s"
+    return text
+
+def format_context_reuse(final, context):
+    """
+    Describes the prompt evaluation of a call that continued a previous context:
+    how many new prompt tokens were evaluated and how many were reused.
+    """
+    evaluated = final.get("prompt_eval_count")
+    if evaluated is None:
+        return "prompt evaluation not reported"
+    seconds = final.get("prompt_eval_duration", 0) / 1e9
+    text = f"prompt eval: {evaluated} new tokens in {seconds:.2f}s"
+    if context:
+        # Estimate the time the reused tokens would have taken at this turn's rate
+        saved = len(context) * seconds / evaluated if evaluated else 0.0
+        text += f", {len(context)} tokens reused from previous turns (~{saved:.2f}s saved)"
+    return text
+
+class LiveResponse:
+    """
+    Live console panel that shows a streamed response as its chunks are added.
+    Time to first token and tokens/sec are shown under the panel once it closes.
+    """
+    def __init__(self, console, title="LLM Response", border_style="magenta", style=""):
+        self.console = console
+        self.title = title
+        self.border_style = border_style
+        self.style = style
+        self.output = ""
+        self.chunks = 0
+        self.final = {}
+        self.first_token = None
+        self.stats = None
+
+    def _panel(self, subtitle=None):
+        # Plain Text, so a half-received "[" is never parsed as markup
+        return Panel(Text(self.output or "..."), title=self.title, subtitle=subtitle,
+                     style=self.style, border_style=self.border_style)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.live = Live(self._panel(), console=self.console, refresh_per_second=12, vertical_overflow="visible")
+        self.live.__enter__()
+        return self
+
+    def add(self, chunk):
+        if chunk.get("response"):
+            if self.first_token is None:
+                self.first_token = time.perf_counter()
+            self.output += chunk["response"]
+            self.chunks += 1
+            self.live.update(self._panel())
+        if chunk.get("done"):
+            self.final = chunk
+
+    def __exit__(self, *exc_info):
+        self.stats = stream_stats(self.start, self.first_token, time.perf_counter(), self.chunks, self.final)
+        self.live.update(self._panel(format_stats(self.stats)))
+        return self.live.__exit__(*exc_info)
+
+def _feed_partial(parser, chunk, on_partial_json):
+    # Reports the fields of the JSON object each time another top-level field is complete
+    count = len(parser.fields)
+    parser.feed(chunk.get("response", ""))
+    if len(parser.fields) > count:
+        on_partial_json(parser.fields)
+
+def stream_live(prompt, model, console, title="LLM Response", border_style="magenta", style="", on_partial_json=None,
+                **fields):
+    """
+    Streams the generated text into a live panel on the console as tokens arrive and
+    returns the finished LiveResponse (output, final chunk and stats).
+    on_partial_json, if given, is called with the completed top-level fields of the
+    response's JSON object while it is still streaming, e.g. to start a tool early.
+    """
+    parser = JsonObjectParser() if on_partial_json else None
+    with LiveResponse(console, title, border_style, style) as live:
+        for chunk in stream_generate(prompt, model, **fields):
+            live.add(chunk)
+            if parser is not None:
+                _feed_partial(parser, chunk, on_partial_json)
+    return live
+
+async def astream_live(prompt, model, console, title="LLM Response", border_style="magenta", style="",
+                       on_partial_json=None, **fields):
+    """
+    Async version of stream_live; the event loop keeps running while tokens arrive.
+    """
+    parser = JsonObjectParser() if on_partial_json else None
+    with LiveResponse(console, title, border_style, style) as live:
+        async for chunk in astream_generate(prompt, model, **fields):
+            live.add(chunk)
+            if parser is not None:
+                _feed_partial(parser, chunk, on_partial_json)
+    return live
+
+def generate_live(prompt, model, console, title="LLM Response", border_style="magenta", style="", **fields):
+    """
+    Like stream_live, but returns just the full text.
+    """
+    return stream_live(prompt, model, console, title, border_style, style, **fields).output
+
+async def agenerate_live(prompt, model, console, title="LLM Response", border_style="magenta", style="", **fields):
+    """
+    Async version of generate_live.
+    """
+    return (await astream_live(prompt, model, console, title, border_style, style, **fields)).output
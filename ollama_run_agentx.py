@@ -1,12 +1,16 @@
-import requests
+import ollama_client
+import llm_metrics
+import tool_cache
+import agent_protocol
+from prompt_builder import PromptBuilder, format_tools
 import json
+from concurrent.futures import ThreadPoolExecutor
 from rich.console import Console, Group
 from rich.panel import Panel
 from rich.prompt import Prompt
-from sales_tools import summarize_sales, get_top_product, average_sales, filter_by_region, sales_trend, total_sales_by_region
+from sales_tools import summarize_sales, get_top_product, average_sales, filter_by_region, sales_trend, total_sales_by_region, revenue_between
 
-model_name = "llama3.1:latest"
-model_url_generate = "http://localhost:11434/api/generate"
+model_name = ollama_client.resolve_model("llama3.1:latest")
 
 #Get me the sales for relevant region, and let me know in how many days can I return stuff from IKEA
 
@@ -30,6 +34,11 @@ with open('user_profile.txt', 'r') as f:
 file = 'sales_data.csv'
 region = 'North'
 
+# Independent tool calls of one turn run on this many threads (pandas releases the
+# GIL for most of its work, and files already loaded are shared from the cache)
+tool_workers = 4
+_tool_pool = ThreadPoolExecutor(max_workers=tool_workers)
+
 tool_functions = {
     "summarize_sales": summarize_sales,
     "get_top_product": get_top_product,
@@ -37,20 +46,11 @@ tool_functions = {
     "filter_by_region": filter_by_region,
     "sales_trend": sales_trend,
     "total_sales_by_region": total_sales_by_region,
+    "revenue_between": revenue_between,
 }
 
-def generate_system_prompt(context, user_profile, tools_desc, history, user_query, current_message):
-    tools_info = ""
-    for tool in tools_desc:
-        tools_info += (
-            f"Tool Name: {tool['name']}\n"
-            f"Description: {tool['description']}\n"
-            f"Parameters: {', '.join(tool['parameters'])}\n\n"
-        )
-    history_str = ""
-    for i, (u, a) in enumerate(history):
-        step_num = i + 1
-        history_str += f"Step {step_num}:\nUser: {u}\nAgent: {a}\n"
+def generate_prompt_prefix(context, user_profile, tools_desc, user_query):
+    tools_info = format_tools(tools_desc)
     return f"""
 You are an AI assistant and your task is to complete the user's query.
 
@@ -70,99 +70,120 @@ File name: {file}
 {context}
 
 [Conversation History]
-{history_str}
-
-You break down user's query into steps if needed. 
-For each step, decide if you need to use a tool, reference the context, or use user memory. 
-If you use a tool, respond ONLY with a JSON object:
-{{
-  "tool": "<tool_name>",
-  "parameters": {{"param1": "value1", ...}},
-  "next_step": "<What to do next or ask the user next>"
-}}
-If the task is complete, respond with:
-{{
-  "complete": true,
-  "final_answer": "<your final answer to the user's overall query>"
-}}
-Otherwise, answer directly and suggest the next step.
-
-Latest user input:
-{current_message}
 """
 
+def generate_prompt_builder(context, user_profile, tools_desc, user_query, history=()):
+    # The prefix is rendered once per session and the history is appended step by step
+    builder = PromptBuilder(generate_prompt_prefix(context, user_profile, tools_desc, user_query), agent_protocol.prompt_suffix,
+                            history_token_budget=agent_protocol.history_token_budget)
+    for u, a in history:
+        builder.add_step(u, a)
+    return builder
+
+def generate_system_prompt(context, user_profile, tools_desc, history, user_query, current_message):
+    return generate_prompt_builder(context, user_profile, tools_desc, user_query, history).render(current_message)
+
 def generate_response(prompt, model=model_name):
-    payload = {
-        "model": model,
-        "prompt": prompt
-    }
-    response = requests.post(model_url_generate, json=payload, stream=True)
-    response.raise_for_status()
-    output = ""
-    for line in response.iter_lines():
-        if line:
-            data = line.decode("utf-8")
-            try:
-                obj = json.loads(data)
-                output += obj.get("response", "")
-            except Exception:
-                output += data
-    return output
+    return ollama_client.generate_response(prompt, model)
 
 def try_execute_tool(tool_name, params):
     try:
         if tool_name not in tool_functions:
             return f"Tool '{tool_name}' not found."
-        func = tool_functions[tool_name]
-        if tool_name == "filter_by_region" or tool_name == "total_sales_by_region":
-            return func(params.get("file", file), params.get("region", region))
-        else:
-            return func(params.get("file", file))
+        return agent_protocol.run_sales_tool(tool_name, params, file, region)
     except Exception as e:
         return f"Error executing tool: {e}"
 
+def execute_tools(calls):
+    """
+    Runs the independent tool calls of one turn concurrently and returns their
+    results in order.
+    """
+    if len(calls) == 1:
+        return [try_execute_tool(*calls[0])]
+    return list(_tool_pool.map(lambda call: try_execute_tool(*call), calls))
+
+class SpeculativeTools(agent_protocol.SpeculativeTools):
+    """
+    Speculative tool calls run on the tool pool. The sales tools only read the
+    file, so every call can be started early.
+    """
+    def __init__(self):
+        super().__init__(lambda calls: [_tool_pool.submit(try_execute_tool, *call) for call in calls])
+
+    def results(self, calls):
+        """
+        Returns the speculative results if the finished response made the same calls,
+        otherwise cancels them and returns None.
+        """
+        futures = self.pending_for(calls)
+        return None if futures is None else [future.result() for future in futures]
+
 if __name__ == "__main__":
     console = Console()
     console.print(f"[bold blue]USING MODEL[/bold blue]\n", justify="center")
     console.print(f"\n[bold white on blue]   {model_name}  [/bold white on blue]", justify="center")
     console.rule("[bold green]AgentX Demo: Grounding + Tools + Memory + Context + Multi-step Reasoning")
 
-    history = []
     loop_num = 1
+    context = None
+    tool_note = None
 
     user_query = Prompt.ask("[bold yellow]Enter your overall task or question for the AI")
     current_message = user_query  # Start with the overall query as the first message
+    builder = generate_prompt_builder(grounding_blurb, user_profile, tools_desc, user_query)
 
     while True:
         console.print(f"\n[bold yellow]--- Loop {loop_num} ---[/bold yellow]\n")
-        system_prompt = generate_system_prompt(
-            grounding_blurb, user_profile, tools_desc, history, user_query, current_message
-        )
-        console.print(Panel(system_prompt, title="[bold cyan]System Prompt[/bold cyan]", border_style="cyan"))
-
-        llm_response = generate_response(system_prompt)
-        console.print(Panel(llm_response, title="[bold magenta]LLM Response[/bold magenta]", border_style="magenta"))
+        if context is None:
+            system_prompt = builder.render(current_message)
+            console.print(Panel(system_prompt, title="[bold cyan]System Prompt[/bold cyan]", border_style="cyan"))
+        else:
+            system_prompt = agent_protocol.generate_turn_prompt(tool_note, current_message)
+            console.print(Panel(system_prompt, title="[bold cyan]Turn Prompt (continuing context)[/bold cyan]", border_style="cyan"))
+        tool_note = None
+
+        # Tokens are shown as they arrive
+        fields = {"context": context} if context else {}
+        speculation = SpeculativeTools()
+        live = ollama_client.stream_live(system_prompt, model_name, console, title="[bold magenta]LLM Response[/bold magenta]", border_style="magenta",
+                format="json", stop_at_json=not agent_protocol.reuse_context, label=f"loop {loop_num}", on_partial_json=speculation.on_partial_json, **fields)
+        llm_response = live.output
+        console.print(f"[dim]{ollama_client.format_context_reuse(live.final, context)}[/dim]")
+        if agent_protocol.reuse_context:
+            context = live.final.get("context")
+        # A context grown past the limit is dropped, so the next turn starts again
+        # from the full prompt with the compacted history
+        if context and len(context) > agent_protocol.context_token_limit:
+            console.print(f"[dim]Context of {len(context)} tokens is over {agent_protocol.context_token_limit}; the next turn sends the full prompt.[/dim]")
+            context = None
 
         # Try to parse tool call or completion from LLM response
         try:
-            import re
-            match = re.search(r"\{[\s\S]*\}", llm_response)
-            if match:
-                tool_json = json.loads(match.group())
+            # The response is constrained to JSON and stops once the object is complete
+            tool_json = ollama_client.find_json_object(llm_response)
+            if tool_json is not None:
                 if tool_json.get("complete"):
                     final_answer = tool_json.get("final_answer", "Task complete.")
                     console.print(Panel(final_answer, title="[bold green]Final Answer[/bold green]", border_style="green"))
-                    history.append((current_message, final_answer))
+                    builder.add_step(current_message, final_answer)
                     break
-                elif "tool" in tool_json:
-                    tool_name = tool_json.get("tool")
-                    params = tool_json.get("parameters", {})
-                    tool_result = try_execute_tool(tool_name, params)
-                    console.print(Panel(f"Tool: {tool_name}\nParameters: {params}\nResult: {tool_result}",
-                                        title="[green]Tool Execution[/green]", border_style="green"))
+                elif "tool" in tool_json or "tools" in tool_json:
+                    calls = agent_protocol.tool_calls(tool_json)
+                    tool_results = speculation.results(calls)
+                    if speculation.calls is not None:
+                        console.print("[dim]Tool results from speculative execution.[/dim]" if tool_results is not None
+                                      else "[dim]Speculative tool calls discarded; the final call differs.[/dim]")
+                    if tool_results is None:
+                        tool_results = execute_tools(calls)
+                    console.print(Panel("\n\n".join(f"Tool: {tool_name}\nParameters: {params}\nResult: {tool_result}"
+                                                    for (tool_name, params), tool_result in zip(calls, tool_results)),
+                                        title=f"[green]Tool Execution ({len(calls)} tools)[/green]" if len(calls) > 1
+                                        else "[green]Tool Execution[/green]", border_style="green"))
                     # Add to history and continue with next step
-                    agent_reply = f"Tool used: {tool_name}\nResult: {tool_result}"
-                    history.append((current_message, agent_reply))
+                    agent_reply = agent_protocol.format_tool_results(calls, tool_results)
+                    tool_note = agent_reply
+                    builder.add_step(current_message, agent_reply)
                     # LLM's next_step is a question or instruction for the user
                     next_step = tool_json.get("next_step", "What should I do next?")
                     user_input = Prompt.ask(f"[bold yellow]Agent: {next_step}\nYour reply")
@@ -170,20 +191,24 @@ if __name__ == "__main__":
                 else:
                     # Not a tool or completion, treat as normal reply
                     agent_reply = llm_response
-                    history.append((current_message, agent_reply))
+                    builder.add_step(current_message, agent_reply)
                     user_input = Prompt.ask("[bold yellow]Agent: (next step or question above)\nYour reply")
                     current_message = user_input
             else:
                 # Not a JSON, treat as normal reply
                 agent_reply = llm_response
-                history.append((current_message, agent_reply))
+                builder.add_step(current_message, agent_reply)
                 user_input = Prompt.ask("[bold yellow]Agent: (next step or question above)\nYour reply")
                 current_message = user_input
         except Exception as e:
             agent_reply = llm_response + f"\n[red]Error parsing tool call: {e}[/red]"
-            history.append((current_message, agent_reply))
+            builder.add_step(current_message, agent_reply)
             user_input = Prompt.ask("[bold yellow]Agent: (next step or question above)\nYour reply")
             current_message = user_input
 
         loop_num += 1
-        input("\n[bold blue]Press Enter to proceed to the next loop...[/bold blue]\n")
\ No newline at end of file
+        input("\n[bold blue]Press Enter to proceed to the next loop...[/bold blue]\n")
+
+    # Where the time went: per-loop prompt size and LLM timings
+    console.print(llm_metrics.summary_table())
+    console.print(f"[dim]{tool_cache.format_cache_info()}[/dim]")
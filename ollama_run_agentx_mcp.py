@@ -1,16 +1,19 @@
 from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
 import asyncio
-import requests
+import ollama_client
+import llm_metrics
+import tool_cache
+import agent_protocol
+from prompt_builder import PromptBuilder, format_tools
 import json
 from rich.console import Console, Group
 from rich.panel import Panel
 from rich.prompt import Prompt
-from sales_tools import summarize_sales, get_top_product, average_sales, filter_by_region, sales_trend, total_sales_by_region
+from sales_tools import summarize_sales, get_top_product, average_sales, filter_by_region, sales_trend, total_sales_by_region, revenue_between
 
 
-model_name = "llama3.1:latest"
-model_url_generate = "http://localhost:11434/api/generate"
+model_name = ollama_client.resolve_model("llama3.1:latest")
 
 #Get me the sales for relevant region, and let me know in how many days can I return stuff from IKEA
 
@@ -41,20 +44,11 @@ tool_functions = {
     "filter_by_region": filter_by_region,
     "sales_trend": sales_trend,
     "total_sales_by_region": total_sales_by_region,
+    "revenue_between": revenue_between,
 }
 
-def generate_system_prompt(context, user_profile, tools_desc, mcp_tool_desc, history, user_query, current_message):
-    tools_info = ""
-    for tool in tools_desc:
-        tools_info += (
-            f"Tool Name: {tool['name']}\n"
-            f"Description: {tool['description']}\n"
-            f"Parameters: {', '.join(tool['parameters'])}\n\n"
-        )
-    history_str = ""
-    for i, (u, a) in enumerate(history):
-        step_num = i + 1
-        history_str += f"Step {step_num}:\nUser: {u}\nAgent: {a}\n"
+def generate_prompt_prefix(context, user_profile, tools_desc, mcp_tool_desc, user_query):
+    tools_info = format_tools(tools_desc)
     return f"""
 You are an AI assistant and your task is to complete the user's query.
 
@@ -77,44 +71,27 @@ File name for Sales Tools: {file}
 {context}
 
 [Conversation History]
-{history_str}
-
-You break down user's query into steps if needed. 
-For each step, decide if you need to use a tool, reference the context, or use user memory. 
-If you use a tool, respond ONLY with a JSON object:
-{{
-  "tool": "<tool_name>",
-  "parameters": {{"param1": "value1", ...}},
-  "next_step": "<What to do next or ask the user next>"
-}}
-If the task is complete, respond with:
-{{
-  "complete": true,
-  "final_answer": "<your final answer to the user's overall query>"
-}}
-Otherwise, answer directly and suggest the next step.
-
-Latest user input:
-{current_message}
 """
 
+def generate_prompt_builder(context, user_profile, tools_desc, mcp_tool_desc, user_query, history=()):
+    # The prefix is rendered once per session and the history is appended step by step
+    builder = PromptBuilder(generate_prompt_prefix(context, user_profile, tools_desc, mcp_tool_desc, user_query), agent_protocol.prompt_suffix,
+                            history_token_budget=agent_protocol.history_token_budget)
+    for u, a in history:
+        builder.add_step(u, a)
+    return builder
+
+def generate_system_prompt(context, user_profile, tools_desc, mcp_tool_desc, history, user_query, current_message):
+    return generate_prompt_builder(context, user_profile, tools_desc, mcp_tool_desc, user_query, history).render(current_message)
+
 def generate_response(prompt, model=model_name):
-    payload = {
-        "model": model,
-        "prompt": prompt
-    }
-    response = requests.post(model_url_generate, json=payload, stream=True)
-    response.raise_for_status()
-    output = ""
-    for line in response.iter_lines():
-        if line:
-            data = line.decode("utf-8")
-            try:
-                obj = json.loads(data)
-                output += obj.get("response", "")
-            except Exception:
-                output += data
-    return output
+    return ollama_client.generate_response(prompt, model)
+
+def is_deterministic(tool):
+    # A read-only, idempotent tool that does not reach outside the server (openWorldHint
+    # false) returns the same result for the same arguments
+    hints = getattr(tool, "annotations", None)
+    return bool(hints and hints.readOnlyHint and hints.idempotentHint and hints.openWorldHint is False)
 
 async def execute_tool_in_mcp(tool_name, params, tools):
 
@@ -176,7 +153,12 @@ async def execute_tool_in_mcp(tool_name, params, tools):
     print(f"DEBUG: Calling tool {func_name}")
 
     try:
-        result = await session.call_tool(func_name, arguments=arguments)
+        if is_deterministic(tool):
+            # The same arguments always give the same result, so it is only computed once
+            result = await tool_cache.amemoize(func_name, arguments,
+                                               lambda: session.call_tool(func_name, arguments=arguments))
+        else:
+            result = await session.call_tool(func_name, arguments=arguments)
         print(f"DEBUG: Raw result: {result}")
         # Get the full result content
         if hasattr(result, 'content'):
@@ -203,11 +185,8 @@ async def try_execute_tool(tool_name, params, math_tools):
     try:
         if tool_name in tool_functions:
             print(f"DEBUG: Found tool function {tool_name}")
-            func = tool_functions[tool_name]
-            if tool_name == "filter_by_region" or tool_name == "total_sales_by_region":
-                return func(params.get("file", file), params.get("region", region))
-            else:
-                return func(params.get("file", file))
+            # Run the pandas work in a thread so it does not block the event loop
+            return await asyncio.to_thread(agent_protocol.run_sales_tool, tool_name, params, file, region)
         else:
             print(f"DEBUG: Tool {tool_name} not found, executing in MCP")
             result = await execute_tool_in_mcp(tool_name, params, math_tools)
@@ -215,6 +194,35 @@ async def try_execute_tool(tool_name, params, math_tools):
     except Exception as e:
         return f"Error executing tool: {e}"
 
+async def execute_tools(calls, math_tools):
+    # Independent calls run together: MCP calls share the session and sales tools
+    # run in threads; errors come back as results
+    return await asyncio.gather(*(try_execute_tool(tool_name, params, math_tools) for tool_name, params in calls))
+
+def is_pure(tool_name, math_tools):
+    # Sales tools only read the file; MCP tools must declare it
+    if tool_name in tool_functions:
+        return True
+    tool = next((t for t in math_tools if t.name == tool_name), None)
+    return tool is not None and is_deterministic(tool)
+
+class SpeculativeTools(agent_protocol.SpeculativeTools):
+    """
+    Speculative tool calls run as one task on the event loop. Only pure tools are
+    started: the sales tools and MCP tools declared deterministic.
+    """
+    def __init__(self, math_tools):
+        super().__init__(lambda calls: [asyncio.ensure_future(execute_tools(calls, math_tools))],
+                         lambda tool_name: is_pure(tool_name, math_tools))
+
+    async def results(self, calls):
+        """
+        Returns the speculative results if the finished response made the same calls,
+        otherwise cancels them and returns None.
+        """
+        tasks = self.pending_for(calls)
+        return None if tasks is None else await tasks[0]
+
 async def main():
     console = Console()
     console.print(f"[bold blue]USING MODEL[/bold blue]\n", justify="center")
@@ -285,42 +293,65 @@ async def main():
             console.print(Panel("MCP math server initialized with tools.", title="MCP Math Server", border_style="bold cyan"))
             print("\n")
 
-            history = []
             loop_num = 1
+            context = None
+            tool_note = None
 
             user_query = Prompt.ask("[bold yellow]Enter your overall task or question for the AI")
             current_message = user_query  # Start with the overall query as the first message
+            builder = generate_prompt_builder(grounding_blurb, user_profile, tools_desc, math_tools_description, user_query)
 
             while True:
                 console.print(f"\n[bold yellow]--- Loop {loop_num} ---[/bold yellow]\n")
-                system_prompt = generate_system_prompt(
-                    grounding_blurb, user_profile, tools_desc, math_tools_description, history, user_query, current_message
-                )
-                console.print(Panel(system_prompt, title="[bold cyan]System Prompt[/bold cyan]", border_style="cyan"))
-
-                llm_response = generate_response(system_prompt)
-                console.print(Panel(llm_response, title="[bold magenta]LLM Response[/bold magenta]", border_style="magenta"))
+                if context is None:
+                    system_prompt = builder.render(current_message)
+                    console.print(Panel(system_prompt, title="[bold cyan]System Prompt[/bold cyan]", border_style="cyan"))
+                else:
+                    system_prompt = agent_protocol.generate_turn_prompt(tool_note, current_message)
+                    console.print(Panel(system_prompt, title="[bold cyan]Turn Prompt (continuing context)[/bold cyan]", border_style="cyan"))
+                tool_note = None
+
+                # Tokens are shown as they arrive
+                fields = {"context": context} if context else {}
+                speculation = SpeculativeTools(math_tools)
+                live = await ollama_client.astream_live(system_prompt, model_name, console, title="[bold magenta]LLM Response[/bold magenta]", border_style="magenta",
+                        format="json", stop_at_json=not agent_protocol.reuse_context, label=f"loop {loop_num}", on_partial_json=speculation.on_partial_json, **fields)
+                llm_response = live.output
+                console.print(f"[dim]{ollama_client.format_context_reuse(live.final, context)}[/dim]")
+                if agent_protocol.reuse_context:
+                    context = live.final.get("context")
+                # A context grown past the limit is dropped, so the next turn starts again
+                # from the full prompt with the compacted history
+                if context and len(context) > agent_protocol.context_token_limit:
+                    console.print(f"[dim]Context of {len(context)} tokens is over {agent_protocol.context_token_limit}; the next turn sends the full prompt.[/dim]")
+                    context = None
 
                 # Try to parse tool call or completion from LLM response
                 try:
-                    import re
-                    match = re.search(r"\{[\s\S]*\}", llm_response)
-                    if match:
-                        tool_json = json.loads(match.group())
+                    # The response is constrained to JSON and stops once the object is complete
+                    tool_json = ollama_client.find_json_object(llm_response)
+                    if tool_json is not None:
                         if tool_json.get("complete"):
                             final_answer = tool_json.get("final_answer", "Task complete.")
                             console.print(Panel(final_answer, title="[bold green]Final Answer[/bold green]", border_style="green"))
-                            history.append((current_message, final_answer))
+                            builder.add_step(current_message, final_answer)
                             break
-                        elif "tool" in tool_json:
-                            tool_name = tool_json.get("tool")
-                            params = tool_json.get("parameters", {})
-                            tool_result = await try_execute_tool(tool_name, params, math_tools)
-                            console.print(Panel(f"Tool: {tool_name}\nParameters: {params}\nResult: {tool_result}",
-                                                title="[green]Tool Execution[/green]", border_style="green"))
+                        elif "tool" in tool_json or "tools" in tool_json:
+                            calls = agent_protocol.tool_calls(tool_json)
+                            tool_results = await speculation.results(calls)
+                            if speculation.calls is not None:
+                                console.print("[dim]Tool results from speculative execution.[/dim]" if tool_results is not None
+                                              else "[dim]Speculative tool calls discarded; the final call differs.[/dim]")
+                            if tool_results is None:
+                                tool_results = await execute_tools(calls, math_tools)
+                            console.print(Panel("\n\n".join(f"Tool: {tool_name}\nParameters: {params}\nResult: {tool_result}"
+                                                            for (tool_name, params), tool_result in zip(calls, tool_results)),
+                                                title=f"[green]Tool Execution ({len(calls)} tools)[/green]" if len(calls) > 1
+                                                else "[green]Tool Execution[/green]", border_style="green"))
                             # Add to history and continue with next step
-                            agent_reply = f"Tool used: {tool_name}\nResult: {tool_result}"
-                            history.append((current_message, agent_reply))
+                            agent_reply = agent_protocol.format_tool_results(calls, tool_results)
+                            tool_note = agent_reply
+                            builder.add_step(current_message, agent_reply)
                             # LLM's next_step is a question or instruction for the user
                             next_step = tool_json.get("next_step", "What should I do next?")
                             user_input = Prompt.ask(f"[bold yellow]Agent: {next_step}\nYour reply")
@@ -328,23 +359,29 @@ async def main():
                         else:
                             # Not a tool or completion, treat as normal reply
                             agent_reply = llm_response
-                            history.append((current_message, agent_reply))
+                            builder.add_step(current_message, agent_reply)
                             user_input = Prompt.ask("[bold yellow]Agent: (next step or question above)\nYour reply")
                             current_message = user_input
                     else:
                         # Not a JSON, treat as normal reply
                         agent_reply = llm_response
-                        history.append((current_message, agent_reply))
+                        builder.add_step(current_message, agent_reply)
                         user_input = Prompt.ask("[bold yellow]Agent: (next step or question above)\nYour reply")
                         current_message = user_input
                 except Exception as e:
                     agent_reply = llm_response + f"\n[red]Error parsing tool call: {e}[/red]"
-                    history.append((current_message, agent_reply))
+                    builder.add_step(current_message, agent_reply)
                     user_input = Prompt.ask("[bold yellow]Agent: (next step or question above)\nYour reply")
                     current_message = user_input
 
                 loop_num += 1
                 input("\n[bold blue]Press Enter to proceed to the next loop...[/bold blue]\n")
 
+            # Where the time went: per-loop prompt size and LLM timings
+            console.print(llm_metrics.summary_table())
+            console.print(f"[dim]{tool_cache.format_cache_info()}[/dim]")
+
+            await ollama_client.aclose_client()
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
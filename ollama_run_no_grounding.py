@@ -1,13 +1,11 @@
-import requests
+import ollama_client
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt
 
 model_type = "ollama"
 #model_name = "mistral"
-model_name = "llama3.1:latest"
-model_url_generate = "http://localhost:11434/api/generate"
-model_url_embed = "http://localhost:11434/api/embeddings"
+model_name = ollama_client.resolve_model("llama3.1:latest")
 
 # Load external knowledge from file
 with open('ikea_return_policy.txt', 'r') as file:
@@ -26,20 +24,7 @@ def generate_llm_prompt(user_prompt):
     
 
 def generate_response(prompt, model=model_name):
-	payload = {
-		"model": model,
-		"prompt": prompt
-	}
-	response = requests.post(model_url_generate, json=payload, stream=True)
-	response.raise_for_status()
-	output = ""
-	for line in response.iter_lines():
-		if line:
-			import json
-			data = line.decode("utf-8")
-			obj = json.loads(data)
-			output += obj.get("response", "")
-	return output
+	return ollama_client.generate_response(prompt, model)
 
 if __name__ == "__main__":
 	console = Console()
@@ -51,6 +36,6 @@ if __name__ == "__main__":
 	final_prompt = generate_llm_prompt(user_prompt)
 	console.print(Panel(final_prompt, title="[bold cyan]LLM Prompt[/bold cyan]", style="bold cyan", border_style="bright_cyan"))
 	print("\n")
-	result = generate_response(final_prompt)
-	console.print(Panel(result, title="[bold cyan]LLM Response[/bold cyan]", style="bold cyan", border_style="bright_cyan"))
+	# Tokens are shown as they arrive
+	result = ollama_client.generate_live(final_prompt, model_name, console, title="[bold cyan]LLM Response[/bold cyan]", style="bold cyan", border_style="bright_cyan")
 
@@ -1,15 +1,13 @@
 
 
 
-import requests
+import ollama_client
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt
 
 model_type = "ollama"
-model_name = "mistral:text"
-model_url_generate = "http://localhost:11434/api/generate"
-model_url_embed = "http://localhost:11434/api/embeddings"
+model_name = ollama_client.resolve_model("mistral:text")
 
 
 
@@ -17,20 +15,7 @@ prompt = "What is the capital of France?"
 
 
 def generate_response(prompt=prompt, model=model_name):
-	payload = {
-		"model": model,
-		"prompt": prompt
-	}
-	response = requests.post(model_url_generate, json=payload, stream=True)
-	response.raise_for_status()
-	output = ""
-	for line in response.iter_lines():
-		if line:
-			import json
-			data = line.decode("utf-8")
-			obj = json.loads(data)
-			output += obj.get("response", "")
-	return output
+	return ollama_client.generate_response(prompt, model)
 
 if __name__ == "__main__":
 	console = Console()
@@ -42,7 +27,7 @@ if __name__ == "__main__":
 	print("\n")
 	console.print(Panel(prompt, title="[bold yellow]LLM Prompt[/bold yellow]", style="bold yellow", border_style="bright_yellow"))
 	print("\n")
-	result = generate_response(prompt)
 	#console.rule("[bold magenta]LLM RESPONSE")
-	console.print(Panel(result, title="[bold cyan]LLM Response[/bold cyan]", style="bold cyan", border_style="bright_cyan"))
+	# Tokens are shown as they arrive
+	result = ollama_client.generate_live(prompt, model_name, console, title="[bold cyan]LLM Response[/bold cyan]", style="bold cyan", border_style="bright_cyan")
 
@@ -1,14 +1,13 @@
-import requests
+import ollama_client
 import json
 from rich.console import Console, Group
 from rich.panel import Panel
 from rich.table import Table
 from rich.prompt import Prompt
-from sales_tools import summarize_sales, get_top_product, average_sales, filter_by_region, sales_trend, total_sales_by_region
+from sales_tools import summarize_sales, get_top_product, average_sales, filter_by_region, sales_trend, total_sales_by_region, revenue_between
 
 model_type = "ollama"
-model_name = "llama3.1:latest"
-model_url_generate = "http://localhost:11434/api/generate"
+model_name = ollama_client.resolve_model("llama3.1:latest")
 
 # Load sales tools descriptions
 with open('sales_tools_description.json', 'r') as f:
@@ -24,8 +23,19 @@ tool_functions = {
     "get_top_product": (get_top_product, {"file": file}),
     "average_sales": (average_sales, {"file": file}),
     "filter_by_region": (filter_by_region, {"file": file, "region": region}),
-    "sales_trend": (sales_trend, {"file": file}),
+    "sales_trend": (sales_trend, {"file": file, "start_date": None, "end_date": None, "granularity": "D"}),
     "total_sales_by_region": (total_sales_by_region, {"file": file, "region": region}),
+    "revenue_between": (revenue_between, {"file": file, "start_date": None, "end_date": None}),
+}
+
+# Ollama constrains the tool selection to this JSON shape
+tool_call_schema = {
+    "type": "object",
+    "properties": {
+        "tool": {"type": "string", "enum": [tool["name"] for tool in tools_desc]},
+        "parameters": {"type": "object"},
+    },
+    "required": ["tool", "parameters"],
 }
 
 def generate_tool_catalog_prompt(tools_desc, user_prompt):
@@ -55,19 +65,7 @@ User's request:
 """
 
 def generate_response(prompt, model=model_name):
-    payload = {
-        "model": model,
-        "prompt": prompt
-    }
-    response = requests.post(model_url_generate, json=payload, stream=True)
-    response.raise_for_status()
-    output = ""
-    for line in response.iter_lines():
-        if line:
-            data = line.decode("utf-8")
-            obj = json.loads(data)
-            output += obj.get("response", "")
-    return output
+    return ollama_client.generate_response(prompt, model)
 
 if __name__ == "__main__":
     console = Console()
@@ -80,17 +78,17 @@ if __name__ == "__main__":
     # Step 1: Let LLM choose tool and parameters
     llm_catalog_prompt = generate_tool_catalog_prompt(tools_desc, user_prompt)
     console.print(Panel(llm_catalog_prompt, title="[bold cyan]LLM Tool Selection Prompt[/bold cyan]", border_style="cyan"))
-    llm_tool_response = generate_response(llm_catalog_prompt)
-    console.print(Panel(llm_tool_response, title="[bold magenta]LLM Tool Selection Response[/bold magenta]", border_style="magenta"))
+    # Tokens are shown as they arrive; tool selection samples greedily, so the same
+    # request picks the same tool and is answered from the response cache next time
+    llm_tool_response = ollama_client.generate_live(llm_catalog_prompt, model_name, console, title="[bold magenta]LLM Tool Selection Response[/bold magenta]", border_style="magenta",
+                                                    format=tool_call_schema, stop_at_json=True, options={"temperature": 0})
 
     # Step 2: Parse LLM response to get tool and parameters
     try:
         # Extract JSON from LLM response (handle possible text before/after JSON)
-        import re
-        match = re.search(r"\{[\s\S]*\}", llm_tool_response)
-        if not match:
+        tool_json = ollama_client.find_json_object(llm_tool_response)
+        if tool_json is None:
             raise ValueError("No JSON object found in LLM response.")
-        tool_json = json.loads(match.group())
         tool_name = tool_json["tool"]
         params = tool_json["parameters"]
     except Exception as e:
@@ -105,11 +103,11 @@ if __name__ == "__main__":
     # Merge default params with LLM params (LLM params take precedence)
     exec_params = default_params.copy()
     exec_params.update(params)
-    # Prepare arguments in correct order
+    # Pass the described parameters by keyword; the tools take the file as file_path
     tool_desc = next(t for t in tools_desc if t["name"] == tool_name)
     param_order = tool_desc["parameters"]
-    func_args = [exec_params[p] for p in param_order]
-    result = func(*func_args)
+    func_args = {"file_path" if p == "file" else p: exec_params[p] for p in param_order}
+    result = func(**func_args)
 
     # Step 4: Display tool execution and result
     table = Table(show_header=True, header_style="bold")
@@ -1,11 +1,9 @@
-import requests
-import json
+import ollama_client
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt
 
-model_name = "llama3.1:latest"
-model_url_generate = "http://localhost:11434/api/generate"
+model_name = ollama_client.resolve_model("llama3.1:latest")
 
 # Load user profile (memory)
 with open('user_profile.txt', 'r') as f:
@@ -25,19 +23,7 @@ User's message:
 """
 
 def generate_response(prompt, model=model_name):
-    payload = {
-        "model": model,
-        "prompt": prompt
-    }
-    response = requests.post(model_url_generate, json=payload, stream=True)
-    response.raise_for_status()
-    output = ""
-    for line in response.iter_lines():
-        if line:
-            data = line.decode("utf-8")
-            obj = json.loads(data)
-            output += obj.get("response", "")
-    return output
+    return ollama_client.generate_response(prompt, model)
 
 if __name__ == "__main__":
     console = Console()
@@ -50,5 +36,5 @@ if __name__ == "__main__":
     memory_prompt = generate_memory_prompt(user_profile, user_prompt)
     console.print(Panel(memory_prompt, title="[bold cyan]LLM Input (With User Memory)[/bold cyan]", border_style="cyan"))
 
-    result = generate_response(memory_prompt)
-    console.print(Panel(result, title="[bold magenta]LLM Response[/bold magenta]", border_style="magenta"))
\ No newline at end of file
+    # Tokens are shown as they arrive
+    result = ollama_client.generate_live(memory_prompt, model_name, console, title="[bold magenta]LLM Response[/bold magenta]", border_style="magenta")
\ No newline at end of file
@@ -0,0 +1,97 @@
+# Rough characters per token, so budgets can be checked without the model's tokenizer
+chars_per_token = 4
+
+def estimate_tokens(text):
+    """
+    Returns a rough token count for text.
+    """
+    return len(text) // chars_per_token + 1
+
+def format_tools(tools_desc):
+    """
+    Returns the tool catalog section of a prompt for the tools in sales_tools_description.json.
+    """
+    tools_info = ""
+    for tool in tools_desc:
+        tools_info += (
+            f"Tool Name: {tool['name']}\n"
+            f"Description: {tool['description']}\n"
+            f"Parameters: {', '.join(tool['parameters'])}\n\n"
+        )
+    return tools_info
+
+class PromptBuilder:
+    """
+    Builds an agent prompt as prefix + conversation history + suffix + latest input.
+    The prefix and suffix are rendered once; history steps are appended one at a time.
+    When the history outgrows history_token_budget, older steps are shortened to
+    compacted_step_chars and, if that is not enough, left out, while the last
+    keep_recent_steps steps always stay whole.
+    """
+    def __init__(self, prefix, suffix, history_token_budget=1500, keep_recent_steps=2, compacted_step_chars=200):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.history_token_budget = history_token_budget
+        self.keep_recent_steps = keep_recent_steps
+        self.compacted_step_chars = compacted_step_chars
+        # Rendered text of each step still in the history, oldest first
+        self._steps = []
+        self._compacted = 0
+        self._dropped = 0
+        self._tokens = 0
+        self._history = None
+
+    def _render_step(self, number, user, agent):
+        return f"Step {number}:\nUser: {user}\nAgent: {agent}\n"
+
+    def _shorten(self, text):
+        if len(text) <= self.compacted_step_chars:
+            return text
+        return text[:self.compacted_step_chars] + f"... [{len(text) - self.compacted_step_chars} chars compacted]"
+
+    def add_step(self, user, agent):
+        """
+        Appends one step of the conversation and compacts older steps if the
+        history is over its budget.
+        """
+        number = self._dropped + len(self._steps) + 1
+        step = self._render_step(number, user, agent)
+        self._steps.append((number, user, agent, step))
+        self._tokens += estimate_tokens(step)
+        self._history = None
+        self._compact()
+
+    def _compact(self):
+        old = len(self._steps) - self.keep_recent_steps
+        # Shorten the oldest uncompacted steps first; big tool results go here
+        while self._tokens > self.history_token_budget and self._compacted < old:
+            number, user, agent, step = self._steps[self._compacted]
+            shorter = self._render_step(number, self._shorten(user), self._shorten(agent))
+            self._steps[self._compacted] = (number, user, agent, shorter)
+            self._tokens += estimate_tokens(shorter) - estimate_tokens(step)
+            self._compacted += 1
+        # Then leave out the oldest steps altogether
+        while self._tokens > self.history_token_budget and self._compacted > 0:
+            step = self._steps.pop(0)[3]
+            self._tokens -= estimate_tokens(step)
+            self._compacted -= 1
+            self._dropped += 1
+
+    @property
+    def history_tokens(self):
+        return self._tokens
+
+    def history_text(self):
+        """
+        Returns the rendered history; it is only joined again after it changed.
+        """
+        if self._history is None:
+            note = f"[{self._dropped} earlier steps left out to fit the history budget]\n" if self._dropped else ""
+            self._history = note + "".join(step[3] for step in self._steps)
+        return self._history
+
+    def render(self, current_message):
+        """
+        Returns the full prompt for the latest input.
+        """
+        return f"{self.prefix}{self.history_text()}{self.suffix}{current_message}\n"
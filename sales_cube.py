@@ -0,0 +1,126 @@
+import os
+import threading
+import pandas as pd
+from sales_loader import complete_rows_end, iter_rows_between, read_tail, appended_end
+
+# Rows parsed per chunk while building or refreshing a cube
+build_chunksize = 1_000_000
+
+cube_keys = ['Product', 'Region', 'Date']
+cube_measures = ['Units_Sold', 'Revenue', 'Revenue_per_Unit_Sum', 'Revenue_per_Unit_Count', 'Rows']
+
+_loaded = {}
+_lock = threading.Lock()
+
+def cube_path(file_path):
+    """
+    Returns the path of the persisted aggregate cube for a sales CSV.
+    """
+    return os.path.splitext(file_path)[0] + '.cube.pkl'
+
+def _aggregate_rows(df):
+    revenue_per_unit = df['Revenue'] / df['Units_Sold']
+    cells = pd.DataFrame({
+        'Product': df['Product'],
+        'Region': df['Region'],
+        'Date': pd.to_datetime(df['Date']),
+        'Units_Sold': df['Units_Sold'],
+        'Revenue': df['Revenue'],
+        'Revenue_per_Unit_Sum': revenue_per_unit,
+        'Revenue_per_Unit_Count': revenue_per_unit.notna().astype('int64'),
+        'Rows': 1,
+    })
+    return cells.groupby(cube_keys, as_index=False, observed=True)[cube_measures].sum()
+
+def _merge(cube, cells):
+    if cube is None:
+        return cells
+    return pd.concat([cube, cells]).groupby(cube_keys, as_index=False, observed=True)[cube_measures].sum()
+
+def _fold_rows(cube, file_path, start, stop, names):
+    for chunk in iter_rows_between(file_path, start, stop, names, build_chunksize):
+        names = list(chunk.columns)
+        cube = _merge(cube, _aggregate_rows(chunk))
+    return cube, names
+
+def _save(file_path, state):
+    path = cube_path(file_path)
+    pd.to_pickle(state, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+def _build(file_path):
+    stat = os.stat(file_path)
+    offset = complete_rows_end(file_path, stat.st_size)
+    cube, names = _fold_rows(None, file_path, 0, offset, None)
+    if cube is None:
+        cube = pd.DataFrame(columns=cube_keys + cube_measures)
+        names = list(pd.read_csv(file_path, nrows=0).columns)
+    return {
+        'names': names,
+        'offset': offset,
+        'tail': read_tail(file_path, offset),
+        'stamp': (stat.st_mtime_ns, stat.st_size),
+        'cube': cube,
+    }
+
+def _refresh(file_path, state):
+    stat = os.stat(file_path)
+    if state['stamp'] == (stat.st_mtime_ns, stat.st_size):
+        return state, False
+    end = appended_end(file_path, state['offset'], state['tail'], stat.st_size)
+    if end is None:
+        return _build(file_path), True
+    cube, _ = _fold_rows(state['cube'], file_path, state['offset'], end, state['names'])
+    return {
+        'names': state['names'],
+        'offset': end,
+        'tail': read_tail(file_path, end),
+        'stamp': (stat.st_mtime_ns, stat.st_size),
+        'cube': cube,
+    }, True
+
+def build_cube(file_path):
+    """
+    Builds the Product x Region x Date aggregate cube for a sales CSV and persists it
+    next to the file. Once it exists the sales tools answer from it.
+    """
+    state = _build(file_path)
+    _save(file_path, state)
+    with _lock:
+        _loaded[os.path.abspath(file_path)] = state
+    return state['cube']
+
+def load_cube(file_path):
+    """
+    Returns the up-to-date cube for a sales CSV, or None if no cube was built for it.
+    Rows appended to the CSV since the last call are folded in without a rebuild.
+    """
+    path = cube_path(file_path)
+    key = os.path.abspath(file_path)
+    with _lock:
+        state = _loaded.get(key)
+        if state is None:
+            if not os.path.exists(path):
+                return None
+            state = pd.read_pickle(path)
+        state, changed = _refresh(file_path, state)
+        if changed:
+            _save(file_path, state)
+        _loaded[key] = state
+        return state['cube']
+
+def clear_cache():
+    """
+    Forgets the cubes held in memory; they are read from disk again on next use.
+    """
+    with _lock:
+        _loaded.clear()
+
+def drop_cube(file_path):
+    """
+    Deletes the persisted cube of a sales CSV so the tools go back to raw rows.
+    """
+    with _lock:
+        _loaded.pop(os.path.abspath(file_path), None)
+        if os.path.exists(cube_path(file_path)):
+            os.remove(cube_path(file_path))
@@ -0,0 +1,161 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from sales_loader import complete_rows_end, iter_rows_between, read_tail, appended_end
+
+# Rows parsed per chunk while building an index
+build_chunksize = 1_000_000
+
+# Accepted names for the trend granularities
+granularities = {
+    'D': 'D', 'day': 'D', 'daily': 'D',
+    'W': 'W', 'week': 'W', 'weekly': 'W',
+    'M': 'M', 'month': 'M', 'monthly': 'M',
+}
+
+def granularity_code(granularity):
+    """
+    Returns 'D', 'W' or 'M' for a granularity name, raising ValueError for unknown ones.
+    """
+    try:
+        return granularities[granularity]
+    except (KeyError, TypeError):
+        raise ValueError(f"Unknown granularity {granularity!r}; use one of: {', '.join(granularities)}") from None
+
+_loaded = {}
+_lock = threading.Lock()
+
+def index_path(file_path):
+    """
+    Returns the path of the persisted date index for a sales CSV.
+    """
+    return os.path.splitext(file_path)[0] + '.dateidx.pkl'
+
+def _fold_rows(daily, file_path, start, stop, names):
+    for chunk in iter_rows_between(file_path, start, stop, names, build_chunksize):
+        names = list(chunk.columns)
+        part = chunk['Revenue'].groupby(pd.to_datetime(chunk['Date']), observed=True).sum()
+        daily = part if daily is None else pd.concat([daily, part]).groupby(level=0, observed=True).sum()
+    return daily, names
+
+def _state(file_path, stat, offset, names, daily):
+    if daily is None:
+        daily = pd.Series([], dtype='int64', index=pd.DatetimeIndex([]))
+    daily = daily.sort_index()
+    return {
+        'names': names,
+        'offset': offset,
+        'tail': read_tail(file_path, offset),
+        'stamp': (stat.st_mtime_ns, stat.st_size),
+        'dates': daily.index.values,
+        'daily': daily.values,
+        # prefix[i] is the revenue of every date before dates[i]
+        'prefix': np.concatenate([[0], np.cumsum(daily.values)]),
+    }
+
+def _build(file_path):
+    stat = os.stat(file_path)
+    offset = complete_rows_end(file_path, stat.st_size)
+    daily, names = _fold_rows(None, file_path, 0, offset, None)
+    if names is None:
+        names = list(pd.read_csv(file_path, nrows=0).columns)
+    return _state(file_path, stat, offset, names, daily)
+
+def _refresh(file_path, state):
+    stat = os.stat(file_path)
+    if state['stamp'] == (stat.st_mtime_ns, stat.st_size):
+        return state, False
+    end = appended_end(file_path, state['offset'], state['tail'], stat.st_size)
+    if end is None:
+        return _build(file_path), True
+    daily = pd.Series(state['daily'], index=pd.DatetimeIndex(state['dates']))
+    daily, _ = _fold_rows(daily, file_path, state['offset'], end, state['names'])
+    return _state(file_path, stat, end, state['names'], daily), True
+
+def _save(file_path, state):
+    path = index_path(file_path)
+    pd.to_pickle(state, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+def build_date_index(file_path):
+    """
+    Builds the date index (daily revenue and its prefix sums) of a sales CSV and
+    persists it next to the file. Once it exists sales_trend answers from it.
+    """
+    state = _build(file_path)
+    _save(file_path, state)
+    with _lock:
+        _loaded[os.path.abspath(file_path)] = state
+    return state
+
+def load_date_index(file_path):
+    """
+    Returns the up-to-date date index of a sales CSV, or None if no index was built for it.
+    Rows appended to the CSV since the last call are folded in without a rebuild.
+    """
+    key = os.path.abspath(file_path)
+    with _lock:
+        state = _loaded.get(key)
+        if state is None:
+            if not os.path.exists(index_path(file_path)):
+                return None
+            state = pd.read_pickle(index_path(file_path))
+        state, changed = _refresh(file_path, state)
+        if changed:
+            _save(file_path, state)
+        _loaded[key] = state
+        return state
+
+def clear_cache():
+    """
+    Forgets the date indexes held in memory; they are read from disk again on next use.
+    """
+    with _lock:
+        _loaded.clear()
+
+def drop_date_index(file_path):
+    """
+    Deletes the persisted date index of a sales CSV.
+    """
+    with _lock:
+        _loaded.pop(os.path.abspath(file_path), None)
+    if os.path.exists(index_path(file_path)):
+        os.remove(index_path(file_path))
+
+def _bounds(state, start_date, end_date):
+    dates = state['dates']
+    lo = 0 if start_date is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date)), 'left')
+    hi = len(dates) if end_date is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date)), 'right')
+    return lo, max(lo, hi)
+
+def index_revenue_between(state, start_date=None, end_date=None):
+    """
+    Returns the revenue of the dates between start_date and end_date (inclusive)
+    with two binary searches over the index.
+    """
+    lo, hi = _bounds(state, start_date, end_date)
+    return state['prefix'][hi] - state['prefix'][lo]
+
+def index_trend(state, start_date=None, end_date=None, granularity='D'):
+    """
+    Returns revenue per day, week (starting Monday) or month (starting on the 1st)
+    between start_date and end_date from the index.
+    """
+    granularity = granularity_code(granularity)
+    lo, hi = _bounds(state, start_date, end_date)
+    dates = state['dates'][lo:hi]
+    if granularity == 'D':
+        return pd.Series(state['daily'][lo:hi], index=pd.DatetimeIndex(dates, name='Date'), name='Revenue')
+    if not len(dates):
+        return pd.Series([], dtype=state['daily'].dtype, index=pd.DatetimeIndex([], name='Date'), name='Revenue')
+    first, last = pd.Timestamp(dates[0]).normalize(), pd.Timestamp(dates[-1])
+    if granularity == 'W':
+        starts = pd.date_range(first - pd.Timedelta(days=first.weekday()), last, freq='7D')
+    else:
+        starts = pd.date_range(first.replace(day=1), last, freq='MS')
+    # Each bucket total is a difference of prefix sums at the bucket boundaries
+    edges = np.searchsorted(state['dates'], starts.values, 'left').clip(lo, hi)
+    edges = np.append(edges, hi)
+    totals = state['prefix'][edges[1:]] - state['prefix'][edges[:-1]]
+    return pd.Series(totals, index=pd.DatetimeIndex(starts, name='Date'), name='Revenue')
@@ -0,0 +1,419 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+# Upper bound (in bytes) on the DataFrames kept in the process-wide cache
+cache_max_bytes = 512 * 1024 * 1024
+
+# Rows per chunk when the sales tools stream a file instead of loading it whole (None = load whole)
+stream_chunksize = None
+
+# Read sales data with the declared schema below: categorical text columns,
+# 32-bit integers and parsed dates take several times less memory than the
+# object/int64 columns pandas infers (False = let pandas infer the types)
+compact_dtypes = True
+
+# Declared column types; Date is parsed separately
+sales_schema = {
+    'Product': 'category',
+    'Region': 'category',
+    'Units_Sold': 'int32',
+    # read_csv wraps values that overflow an int32 instead of failing, and a single
+    # row's revenue can pass 2**31, so Revenue keeps 64 bits
+    'Revenue': 'int64',
+}
+
+# Bytes before an ingested offset that must be unchanged for a file to count as appended to
+tail_check_bytes = 256
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_hits = 0
+_cache_misses = 0
+_cache_appends = 0
+_cache_lock = threading.Lock()
+
+def file_fingerprint(file_path):
+    """
+    Returns (absolute path, mtime, size) identifying the current version of a file.
+    """
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+
+def sidecar_path(file_path):
+    """
+    Returns the path of the columnar (Feather) sidecar for a sales CSV.
+    """
+    return os.path.splitext(file_path)[0] + '.feather'
+
+def convert_to_columnar(file_path):
+    """
+    Writes a typed, uncompressed Feather sidecar next to a sales CSV and returns its path.
+    """
+    if feather is None:
+        raise ImportError("pyarrow is required to write columnar sales files (pip install pyarrow)")
+    df = pd.read_csv(file_path, dtype=sales_schema, parse_dates=['Date'])
+    path = sidecar_path(file_path)
+    # Uncompressed Arrow IPC can be memory-mapped without decoding
+    feather.write_feather(df, path, compression='uncompressed')
+    return path
+
+def _csv_options():
+    return {'dtype': sales_schema} if compact_dtypes else {}
+
+def _parse_dates(df):
+    if compact_dtypes and 'Date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['Date']):
+        df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+def region_mask(df, region):
+    """
+    Returns a boolean mask of the rows whose Region matches region, ignoring case.
+    Categorical regions are matched on their few categories and then by integer code.
+    """
+    regions = df['Region']
+    if isinstance(regions.dtype, pd.CategoricalDtype):
+        matching = (regions.cat.categories.str.lower() == region.lower()).nonzero()[0]
+        return regions.cat.codes.isin(matching)
+    return regions.str.lower() == region.lower()
+
+def _fresh_sidecar(file_path, mtime):
+    if feather is None:
+        return None
+    path = sidecar_path(file_path)
+    try:
+        if os.stat(path).st_mtime_ns >= mtime:
+            return path
+    except FileNotFoundError:
+        pass
+    return None
+
+def _read_between(file_path, start, stop, names):
+    if stop <= start:
+        return None
+    with io.BufferedReader(_ByteRange(file_path, start, stop)) as raw:
+        header = 'infer' if start == 0 else None
+        df = pd.read_csv(raw, header=header, names=None if start == 0 else names, **_csv_options())
+    return _parse_dates(df)
+
+def _concat_rows(frames):
+    frames = [df for df in frames if df is not None]
+    frames = [df for df in frames if len(df)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    # Categorical columns only stay categorical when every frame has the same categories
+    for column in frames[0].columns:
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            categories = frames[0][column].cat.categories
+            for df in frames[1:]:
+                categories = categories.append(df[column].cat.categories.difference(categories))
+            frames = [df.assign(**{column: df[column].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+def _read_csv(file_path, size, previous=None):
+    # Returns the rows in the first size bytes and where parsing stopped, so rows
+    # appended later can be parsed on their own and added to the same frame
+    if previous is None:
+        start, names, frames = 0, list(pd.read_csv(file_path, nrows=0).columns), []
+    else:
+        df, ingest = previous
+        start, names, frames = ingest['offset'], ingest['names'], [df.iloc[:ingest['rows']]]
+    # An unterminated last row may still be being written, so it is left for a later
+    # call, like sales_cube and sales_index do
+    end = complete_rows_end(file_path, size)
+    frames.append(_read_between(file_path, start, end, names))
+    rows = sum(len(df) for df in frames if df is not None)
+    ingest = {'offset': end, 'tail': read_tail(file_path, end), 'names': names, 'rows': rows}
+    return _concat_rows(frames), ingest
+
+def _read(file_path, size, sidecar, columns, previous):
+    if sidecar is not None:
+        table = feather.read_table(sidecar, columns=columns, memory_map=True)
+        return table.to_pandas(), None
+    return _read_csv(file_path, size, previous)
+
+def _evict(max_bytes):
+    global _cache_bytes
+    while _cache and _cache_bytes > max_bytes:
+        _, (_, _, nbytes, _) = _cache.popitem(last=False)
+        _cache_bytes -= nbytes
+
+def _cache_slot(file_path, columns):
+    path, mtime, size = file_fingerprint(file_path)
+    sidecar = _fresh_sidecar(file_path, mtime)
+    # Parsing a CSV dominates, so CSV files are always cached whole and sliced per call
+    key = (path, tuple(columns) if columns and sidecar else None)
+    return key, (mtime, size, sidecar), sidecar, size
+
+def is_cached(file_path, columns=None):
+    """
+    Returns True if load_sales would answer from the cache, reading at most the rows
+    appended to the file since it was cached.
+    """
+    key, stamp, sidecar, size = _cache_slot(file_path, columns)
+    with _cache_lock:
+        entries = [_cache.get(candidate) for candidate in (key, (key[0], None))]
+    if any(entry is not None and entry[0] == stamp for entry in entries):
+        return True
+    entry = entries[0]
+    return (sidecar is None and entry is not None and entry[3] is not None
+            and appended_end(file_path, entry[3]['offset'], entry[3]['tail'], size) is not None)
+
+def load_sales(file_path, columns=None):
+    """
+    Returns the sales DataFrame for a file, re-parsing it only if the file changed.
+    Rows appended to a cached CSV are parsed on their own and added to the cached
+    frame; a truncated or rewritten CSV is parsed again in full.
+    A columnar sidecar fresher than the CSV is read instead of the CSV, and only the
+    requested columns are read from it.
+    The returned DataFrame is shared between callers and must not be modified.
+    """
+    global _cache_bytes, _cache_hits, _cache_misses, _cache_appends
+    key, stamp, sidecar, size = _cache_slot(file_path, columns)
+    with _cache_lock:
+        # A cached full frame can serve any column subset
+        for candidate in (key, (key[0], None)):
+            entry = _cache.get(candidate)
+            if entry is not None and entry[0] == stamp:
+                _cache.move_to_end(candidate)
+                _cache_hits += 1
+                df = entry[1]
+                return df[list(columns)] if columns and candidate[1] is None else df
+        previous = None
+        entry = _cache.get(key)
+        if sidecar is None and entry is not None and entry[3] is not None:
+            if appended_end(file_path, entry[3]['offset'], entry[3]['tail'], size) is not None:
+                previous = (entry[1], entry[3])
+        if previous is None:
+            _cache_misses += 1
+        else:
+            _cache_appends += 1
+
+    df, ingest = _read(file_path, size, sidecar, list(key[1]) if key[1] else None, previous)
+    nbytes = int(df.memory_usage(deep=True).sum())
+
+    with _cache_lock:
+        old = _cache.pop(key, None)
+        if old is not None:
+            _cache_bytes -= old[2]
+        if nbytes <= cache_max_bytes:
+            _cache[key] = (stamp, df, nbytes, ingest)
+            _cache_bytes += nbytes
+            _evict(cache_max_bytes)
+    return df[list(columns)] if columns and key[1] is None else df
+
+def iter_sales_chunks(file_path, chunksize, columns=None):
+    """
+    Yields the rows of a sales CSV as DataFrames of at most chunksize rows, bypassing the cache.
+    """
+    with pd.read_csv(file_path, usecols=columns, chunksize=chunksize, **_csv_options()) as reader:
+        for chunk in reader:
+            yield _parse_dates(chunk)
+
+class _ByteRange(io.RawIOBase):
+    """
+    Read-only view of bytes [start, stop) of a file.
+    """
+    def __init__(self, file_path, start, stop):
+        self._file = open(file_path, 'rb')
+        self._file.seek(start)
+        self._remaining = stop - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        data = self._file.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+def complete_rows_end(file_path, size):
+    """
+    Returns the offset just past the last newline in the first size bytes of a file,
+    so a reader never picks up a row that is still being written.
+    """
+    with open(file_path, 'rb') as f:
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            block = f.read(end - start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+            end = start
+    return 0
+
+def read_tail(file_path, offset):
+    """
+    Returns the last tail_check_bytes bytes before offset, which identify the part of
+    a file that was already ingested.
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(max(0, offset - tail_check_bytes))
+        return f.read(min(offset, tail_check_bytes))
+
+def appended_end(file_path, offset, tail, size):
+    """
+    Returns the end of the complete rows appended to a file of size bytes after an
+    ingested offset whose tail bytes are tail, or None if the file was truncated or
+    rewritten and has to be read again from the start.
+    """
+    # Anything other than new bytes after the ingested offset means a rewrite
+    if offset == 0 or size <= offset or read_tail(file_path, offset) != tail:
+        return None
+    return complete_rows_end(file_path, size)
+
+def iter_rows_between(file_path, start, stop, names, chunksize, columns=None):
+    """
+    Yields the rows stored in bytes [start, stop) of a sales CSV in chunks.
+    A range starting at 0 includes the header line; later ranges are parsed with names.
+    """
+    if stop <= start:
+        return
+    header = 'infer' if start == 0 else None
+    reader_names = None if start == 0 else names
+    with io.BufferedReader(_ByteRange(file_path, start, stop)) as raw:
+        with pd.read_csv(raw, header=header, names=reader_names, usecols=columns,
+                         chunksize=chunksize, **_csv_options()) as reader:
+            for chunk in reader:
+                yield _parse_dates(chunk)
+
+def split_row_ranges(file_path, count):
+    """
+    Splits a sales CSV into at most count byte ranges that each start at a row boundary.
+    Returns the column names and the list of (start, stop) ranges; the first range holds the header.
+    """
+    names = list(pd.read_csv(file_path, nrows=0).columns)
+    size = complete_rows_end(file_path, os.path.getsize(file_path))
+    bounds = sorted({0, size} | {complete_rows_end(file_path, size * i // count) for i in range(1, count)})
+    return names, list(zip(bounds[:-1], bounds[1:]))
+
+def _partition_values(relative_path):
+    values = {}
+    for segment in relative_path.split(os.sep):
+        if segment.endswith('.csv'):
+            segment = segment[:-len('.csv')]
+        if '=' in segment:
+            key, value = segment.split('=', 1)
+            values[key.lower()] = value
+    return values
+
+def list_partitions(dir_path):
+    """
+    Returns (file path, partition values) for every CSV under a partitioned sales
+    directory laid out as key=value segments, e.g. region=North/date=2025-01-10.csv.
+    """
+    partitions = []
+    for root, dirs, files in os.walk(dir_path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.csv'):
+                path = os.path.join(root, name)
+                partitions.append((path, _partition_values(os.path.relpath(path, dir_path))))
+    return partitions
+
+def prune_partitions(partitions, regions=None, start_date=None, end_date=None):
+    """
+    Keeps the partitions that can hold rows for the given lowercase regions and date range.
+    Partitions without a region or date key are always kept.
+    """
+    selected = []
+    for path, values in partitions:
+        if regions is not None and 'region' in values and values['region'].lower() not in regions:
+            continue
+        if 'date' in values and (start_date is not None or end_date is not None):
+            # A date key may name a day or a coarser period such as a month
+            period = pd.Period(values['date'])
+            if start_date is not None and period.end_time < pd.Timestamp(start_date):
+                continue
+            if end_date is not None and period.start_time > pd.Timestamp(end_date):
+                continue
+        selected.append((path, values))
+    return selected
+
+def _with_partition_columns(df, values, columns):
+    # Partition keys stand in for columns the partition files leave out
+    for column in ('Region', 'Date'):
+        if column not in df.columns and column.lower() in values:
+            df = df.assign(**{column: values[column.lower()]})
+    order = [column for column in ['Product', 'Region', 'Date', 'Units_Sold', 'Revenue'] if column in df.columns]
+    order += [column for column in df.columns if column not in order]
+    return df[[column for column in order if columns is None or column in columns]]
+
+def load_partitioned(dir_path, columns=None, regions=None, start_date=None, end_date=None):
+    """
+    Returns the rows of the partitions of a sales directory that survive pruning as one DataFrame.
+    """
+    frames = [
+        _with_partition_columns(load_sales(path), values, columns)
+        for path, values in prune_partitions(list_partitions(dir_path), regions, start_date, end_date)
+    ]
+    if not frames:
+        return pd.DataFrame(columns=columns or ['Product', 'Region', 'Date', 'Units_Sold', 'Revenue'])
+    return pd.concat(frames, ignore_index=True)
+
+def iter_partition_frames(partitions, columns=None, chunksize=None):
+    """
+    Yields the rows of the given partitions, one DataFrame per partition or per chunk.
+    Partitions are read directly rather than through the cache.
+    """
+    for path, values in partitions:
+        if chunksize:
+            for chunk in iter_sales_chunks(path, chunksize):
+                yield _with_partition_columns(chunk, values, columns)
+        else:
+            df = _parse_dates(pd.read_csv(path, **_csv_options()))
+            yield _with_partition_columns(df, values, columns)
+
+def iter_partitioned_chunks(dir_path, chunksize, columns=None, regions=None, start_date=None, end_date=None):
+    """
+    Yields the rows of the partitions of a sales directory that survive pruning in chunks.
+    """
+    partitions = prune_partitions(list_partitions(dir_path), regions, start_date, end_date)
+    yield from iter_partition_frames(partitions, columns, chunksize)
+
+def set_cache_limit(max_bytes):
+    """
+    Changes the memory cap of the DataFrame cache, evicting least recently used entries.
+    """
+    global cache_max_bytes
+    with _cache_lock:
+        cache_max_bytes = max_bytes
+        _evict(max_bytes)
+
+def clear_cache():
+    """
+    Drops every cached DataFrame.
+    """
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+def cache_info():
+    """
+    Returns hit/miss counts, appended-row refreshes and current memory use of the DataFrame cache.
+    """
+    with _cache_lock:
+        return {
+            "hits": _cache_hits,
+            "misses": _cache_misses,
+            "appends": _cache_appends,
+            "entries": len(_cache),
+            "bytes": _cache_bytes,
+            "max_bytes": cache_max_bytes,
+        }
@@ -1,58 +1,608 @@
+import functools
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import pandas as pd
+import sales_loader
+from sales_loader import (load_sales, iter_sales_chunks, load_partitioned, iter_partitioned_chunks,
+                          list_partitions, prune_partitions, iter_partition_frames,
+                          split_row_ranges, iter_rows_between, region_mask, is_cached)
+from sales_cube import load_cube
+from sales_index import load_date_index, index_trend, index_revenue_between, granularity_code
 
-def summarize_sales(file_path):
+# Worker processes used to aggregate partitions, or row ranges of a large file,
+# in parallel (None or 1 = aggregate in this process)
+parallel_workers = None
+
+# Files smaller than this are not worth splitting across processes
+parallel_min_bytes = 64 * 1024 * 1024
+
+# Rows filter_by_region shows per page unless a limit is given (None = all rows)
+filter_row_limit = 50
+
+# Rows parsed at a time by a worker reading its row range of a file
+_range_chunksize = 1_000_000
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+# Every tool can either load the whole file (cached) or stream it in chunks of
+# chunksize rows. Streaming computes a small partial aggregate per chunk and
+# folds it into a running total, so peak memory does not grow with the file.
+# Tools that only need sums answer from the aggregate cube when one was built
+# for the file (see sales_cube.build_cube), passing it to from_cube.
+# file_path may also be a directory of partitioned CSVs, in which case prune
+# (regions, start_date, end_date) limits which partitions are read.
+# With parallel_workers set, partitions or row ranges are aggregated in a
+# process pool and the partial results are combined here.
+
+def _aggregate(file_path, columns, partial, combine, chunksize, from_cube=None, prune=None):
+    chunksize = chunksize or sales_loader.stream_chunksize
+    prune = prune or {}
+    if from_cube is not None and not os.path.isdir(file_path):
+        cube = load_cube(file_path)
+        if cube is not None:
+            return from_cube(cube)
+    units = _parallel_units(file_path, columns, chunksize, prune)
+    if units:
+        result = _aggregate_parallel(units, columns, partial, combine, chunksize)
+    elif os.path.isdir(file_path):
+        if not chunksize:
+            return partial(load_partitioned(file_path, columns, **prune))
+        result = _fold(iter_partitioned_chunks(file_path, chunksize, columns, **prune), partial, combine)
+    else:
+        if not chunksize:
+            return partial(load_sales(file_path, columns))
+        result = _fold(iter_sales_chunks(file_path, chunksize, columns), partial, combine)
+    if result is None:
+        return partial(pd.DataFrame(columns=columns or _all_columns))
+    return result
+
+def _fold(frames, partial, combine):
+    result = None
+    for frame in frames:
+        # Empty frames carry no rows but would widen the result dtypes to object
+        if frame.empty:
+            continue
+        part = partial(frame)
+        result = part if result is None else combine(result, part)
+    return result
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+def _parallel_units(file_path, columns, chunksize, prune):
+    workers = parallel_workers or 1
+    if workers <= 1:
+        return None
+    # A few units per worker keeps the pool busy when some units are larger
+    count = workers * 4
+    if os.path.isdir(file_path):
+        partitions = prune_partitions(list_partitions(file_path), **prune)
+        if len(partitions) < 2:
+            return None
+        count = min(count, len(partitions))
+        return [('partitions', partitions[i::count]) for i in range(count)]
+    size = os.path.getsize(file_path)
+    if size < parallel_min_bytes:
+        return None
+    # Workers cannot fill the frame cache, so a whole-file load is only fanned out
+    # when its frame is not cached and the file is larger than the cache
+    if not chunksize and (is_cached(file_path, columns) or size <= sales_loader.cache_max_bytes):
+        return None
+    names, ranges = split_row_ranges(file_path, count)
+    return [('range', file_path, start, stop, names) for start, stop in ranges]
+
+def _aggregate_unit(unit, columns, partial, combine, chunksize):
+    if unit[0] == 'partitions':
+        frames = iter_partition_frames(unit[1], columns, chunksize)
+        if not chunksize:
+            # Small partitions are cheaper to aggregate together than one by one
+            frames = [pd.concat(frames, ignore_index=True)]
+    else:
+        _, file_path, start, stop, names = unit
+        frames = iter_rows_between(file_path, start, stop, names, chunksize or _range_chunksize, columns)
+    return _fold(frames, partial, combine)
+
+def _aggregate_parallel(units, columns, partial, combine, chunksize):
+    pool = _get_pool(parallel_workers)
+    parts = pool.map(_aggregate_unit, units, repeat(columns), repeat(partial),
+                     repeat(combine), repeat(chunksize))
+    result = None
+    for part in parts:
+        if part is not None:
+            result = part if result is None else combine(result, part)
+    return result
+
+def _add_grouped(total, part):
+    return pd.concat([total, part]).groupby(level=0, observed=True).sum()
+
+def _add_tuples(total, part):
+    return tuple(a + b for a, b in zip(total, part))
+
+def _product_totals(df):
+    return df.groupby('Product', observed=True)[['Units_Sold', 'Revenue']].sum()
+
+def _product_revenue(df):
+    return df.groupby('Product', observed=True)['Revenue'].sum()
+
+def _revenue_per_unit_parts(df):
+    # Mean of ratios does not combine across chunks, so keep its sum and count
+    revenue_per_unit = df['Revenue'] / df['Units_Sold']
+    return revenue_per_unit.groupby(df['Product'], observed=True).agg(['sum', 'count'])
+
+def _cube_revenue_per_unit_parts(cube):
+    parts = cube.groupby('Product', observed=True)[['Revenue_per_Unit_Sum', 'Revenue_per_Unit_Count']].sum()
+    return parts.set_axis(['sum', 'count'], axis=1)
+
+def _revenue_by_date(df):
+    return df['Revenue'].groupby(pd.to_datetime(df['Date']), observed=True).sum()
+
+def _revenue_by_date_in_range(start_date, end_date, df):
+    return _trend_between(_revenue_by_date(df), start_date, end_date)
+
+def _trend_between(trend, start_date, end_date):
+    if start_date is not None:
+        trend = trend[trend.index >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        trend = trend[trend.index <= pd.Timestamp(end_date)]
+    return trend
+
+def _page_in_region(region, keep, df):
+    # Only the first keep matching rows can be displayed; the rest are just counted
+    matched = df[region_mask(df, region)]
+    return _page_of(matched, keep)
+
+def _page_of(matched, keep):
+    rows = matched if keep is None else matched.head(keep)
+    return (rows, len(matched), matched['Units_Sold'].sum(), matched['Revenue'].sum())
+
+def _add_pages(keep, total, part):
+    rows = pd.concat([total[0], part[0]])
+    if keep is not None:
+        rows = rows.head(keep)
+    return (rows,) + _add_tuples(total[1:], part[1:])
+
+def _revenue_in_region(region, df):
+    matched = df.loc[region_mask(df, region), 'Revenue']
+    return (len(matched), matched.sum())
+
+def _cube_revenue_in_region(region, cube):
+    # Cube cells stand for many rows each; their Rows column holds how many
+    matched = cube.loc[region_mask(cube, region), ['Rows', 'Revenue']]
+    return (matched['Rows'].sum(), matched['Revenue'].sum())
+
+# Partials with arguments are built with functools.partial rather than closures
+# so they can be pickled to worker processes
+
+def _revenue_by_date_between(start_date, end_date):
+    return functools.partial(_revenue_by_date_in_range, start_date, end_date)
+
+def _region_page(region, keep):
+    return functools.partial(_page_in_region, region, keep)
+
+def _region_revenue(region):
+    return functools.partial(_revenue_in_region, region)
+
+def _cube_region_revenue(region):
+    return functools.partial(_cube_revenue_in_region, region)
+
+# Tools compute a structured result first: a dict with the tool name, its
+# parameters, the numbers as DataFrames/Series/dicts ('data') and extra
+# figures ('meta'). Text is only produced by render_result, which the tools
+# call unless structured=True is passed.
+
+def _result(tool, params, data, meta=None):
+    return {'tool': tool, 'params': params, 'data': data, 'meta': meta or {}}
+
+def _summary_result(summary):
+    return _result('summarize_sales', {}, summary)
+
+def _top_product_result(product_sales):
+    data = {'product': product_sales.idxmax(), 'revenue': product_sales.max()}
+    return _result('get_top_product', {}, data)
+
+def _average_result(parts):
+    avg = (parts['sum'] / parts['count']).rename('Revenue_per_Unit')
+    return _result('average_sales', {}, avg)
+
+def _region_page_result(page, region, offset, limit, columns):
+    rows, matched_rows, total_units, total_revenue = page
+    shown = rows.iloc[offset:]
+    if columns:
+        shown = shown[[column for column in shown.columns if column in columns]]
+    meta = {
+        'matched_rows': matched_rows,
+        'total_units': total_units,
+        'total_revenue': total_revenue,
+        'offset': offset,
+    }
+    params = {'region': region, 'limit': limit, 'offset': offset, 'columns': columns}
+    return _result('filter_by_region', params, shown, meta)
+
+def _trend_result(trend, start_date=None, end_date=None, granularity='D'):
+    params = {'start_date': start_date, 'end_date': end_date, 'granularity': granularity}
+    trend = trend.sort_index()
+    # The index and a resampled scan carry different frequencies; neither is shown
+    trend.index = pd.DatetimeIndex(trend.index, freq=None)
+    return _result('sales_trend', params, trend)
+
+def _revenue_between_result(total, start_date, end_date):
+    params = {'start_date': start_date, 'end_date': end_date}
+    return _result('revenue_between', params, {'revenue': total})
+
+def _region_total_result(matched_rows, total_sales, region):
+    data = {'region': region, 'matched_rows': matched_rows, 'total_revenue': total_sales}
+    return _result('total_sales_by_region', {'region': region}, data)
+
+def _render_summary(result):
+    return result['data'].to_string()
+
+def _render_top_product(result):
+    data = result['data']
+    return f"The top-performing product is '{data['product']}' with total revenue of ₹{data['revenue']}."
+
+def _render_average(result):
+    return result['data'].round(2).to_string()
+
+def _render_region_page(result):
+    shown, meta = result['data'], result['meta']
+    region, offset, matched_rows = result['params']['region'], meta['offset'], meta['matched_rows']
+    if matched_rows == 0:
+        return f"No data found for region: {region}"
+    if offset == 0 and len(shown) == matched_rows:
+        return shown.to_string(index=False)
+    if shown.empty:
+        text = f"No rows at offset {offset}."
+    else:
+        text = shown.to_string(index=False)
+        text += f"\n\nShowing rows {offset + 1}-{offset + len(shown)} of {matched_rows}."
+    return (text + f"\nRows in region '{region}': {matched_rows}, "
+            f"total units sold: {meta['total_units']}, total revenue: ₹{meta['total_revenue']}")
+
+def _render_trend(result):
+    return result['data'].to_string()
+
+def _render_revenue_between(result):
+    params = result['params']
+    start = params['start_date'] or 'the first sale'
+    end = params['end_date'] or 'the last sale'
+    return f"Total revenue from {start} to {end}: ₹{result['data']['revenue']}"
+
+def _render_region_total(result):
+    data = result['data']
+    if data['matched_rows'] == 0:
+        return f"No sales data found for region: {data['region']}"
+    return f"Total sales in region '{data['region']}': ₹{data['total_revenue']}"
+
+_renderers = {
+    'summarize_sales': _render_summary,
+    'get_top_product': _render_top_product,
+    'average_sales': _render_average,
+    'filter_by_region': _render_region_page,
+    'sales_trend': _render_trend,
+    'total_sales_by_region': _render_region_total,
+    'revenue_between': _render_revenue_between,
+}
+
+def render_result(result):
+    """
+    Renders a structured sales tool result as the text the tool returns by default.
+    """
+    return _renderers[result['tool']](result)
+
+def _output(result, structured):
+    return result if structured else render_result(result)
+
+def _page_options(limit, offset, columns):
+    # Tool arguments may arrive from the LLM as strings
+    limit = filter_row_limit if limit is None else int(limit)
+    offset = int(offset or 0)
+    if (limit is not None and limit < 0) or offset < 0:
+        raise ValueError(f"limit and offset must not be negative (got limit={limit}, offset={offset})")
+    if isinstance(columns, str):
+        columns = [column.strip() for column in columns.split(',') if column.strip()]
+    if columns and not set(columns).intersection(_all_columns):
+        raise ValueError(f"Unknown columns {', '.join(map(str, columns))}; use any of: {', '.join(_all_columns)}")
+    keep = None if not limit else offset + limit
+    return keep, limit, offset, columns
+
+def summarize_sales(file_path, chunksize=None, structured=False):
     """
     Summarizes total units sold and revenue per product.
     """
-    df = pd.read_csv(file_path)
-    summary = df.groupby('Product')[['Units_Sold', 'Revenue']].sum()
-    return summary.to_string()
+    summary = _aggregate(file_path, ['Product', 'Units_Sold', 'Revenue'],
+                         _product_totals, _add_grouped, chunksize, _product_totals)
+    return _output(_summary_result(summary), structured)
 
-def get_top_product(file_path):
+def get_top_product(file_path, chunksize=None, structured=False):
     """
     Returns the product with the highest total revenue.
     """
-    df = pd.read_csv(file_path)
-    product_sales = df.groupby('Product')['Revenue'].sum()
-    top_product = product_sales.idxmax()
-    top_revenue = product_sales.max()
-    return f"The top-performing product is '{top_product}' with total revenue of ₹{top_revenue}."
+    product_sales = _aggregate(file_path, ['Product', 'Revenue'],
+                               _product_revenue, _add_grouped, chunksize, _product_revenue)
+    return _output(_top_product_result(product_sales), structured)
 
-def average_sales(file_path):
+def average_sales(file_path, chunksize=None, structured=False):
     """
     Calculates average revenue per unit sold for each product.
     """
-    df = pd.read_csv(file_path)
-    df['Revenue per Unit'] = df['Revenue'] / df['Units_Sold']
-    avg = df.groupby('Product')['Revenue per Unit'].mean()
-    return avg.round(2).to_string()
+    parts = _aggregate(file_path, ['Product', 'Units_Sold', 'Revenue'],
+                       _revenue_per_unit_parts, _add_grouped, chunksize,
+                       _cube_revenue_per_unit_parts)
+    return _output(_average_result(parts), structured)
 
-def filter_by_region(file_path, region):
+def filter_by_region(file_path, region, chunksize=None, limit=None, offset=0, columns=None,
+                     structured=False):
     """
     Filters sales data for a specific region.
+    Shows at most limit rows (default filter_row_limit) starting at offset, optionally
+    only the given columns, with a footer of row count and totals when rows are left out.
     """
-    df = pd.read_csv(file_path)
-    filtered = df[df['Region'].str.lower() == region.lower()]
-    if filtered.empty:
-        return f"No data found for region: {region}"
-    return filtered.to_string(index=False)
+    keep, limit, offset, columns = _page_options(limit, offset, columns)
+    page = _aggregate(file_path, None, _region_page(region, keep),
+                      functools.partial(_add_pages, keep), chunksize,
+                      prune={'regions': {region.lower()}})
+    return _output(_region_page_result(page, region, offset, limit, columns), structured)
+
+def _resample_trend(trend, granularity):
+    # Same buckets as sales_index.index_trend: weeks start on Monday, months on the 1st
+    granularity = granularity_code(granularity)
+    if granularity == 'D':
+        return trend
+    trend = trend.sort_index()
+    if granularity == 'W':
+        return trend.resample('W-MON', label='left', closed='left').sum()
+    return trend.resample('MS').sum()
+
+def _date_index(file_path):
+    # Partitioned directories have no date index
+    return None if os.path.isdir(file_path) else load_date_index(file_path)
 
-def sales_trend(file_path):
+def sales_trend(file_path, chunksize=None, start_date=None, end_date=None, granularity='D',
+                structured=False):
     """
-    Analyzes sales trend over time by aggregating revenue by date.
+    Analyzes sales trend over time by aggregating revenue by date,
+    optionally limited to dates between start_date and end_date (inclusive)
+    and summed per week or month (granularity 'D', 'W' or 'M').
+    Answers from the date index when one was built (see sales_index.build_date_index).
     """
-    df = pd.read_csv(file_path)
-    df['Date'] = pd.to_datetime(df['Date'])
-    trend = df.groupby('Date')['Revenue'].sum().sort_index()
-    return trend.to_string()
+    granularity_code(granularity)
+    index = _date_index(file_path)
+    if index is not None:
+        trend = index_trend(index, start_date, end_date, granularity)
+    else:
+        by_date = _revenue_by_date_between(start_date, end_date)
+        trend = _aggregate(file_path, ['Date', 'Revenue'], by_date, _add_grouped, chunksize, by_date,
+                           prune={'start_date': start_date, 'end_date': end_date})
+        trend = _resample_trend(trend, granularity)
+    return _output(_trend_result(trend, start_date, end_date, granularity), structured)
 
-def total_sales_by_region(file_path, region):
+def revenue_between(file_path, start_date=None, end_date=None, chunksize=None, structured=False):
+    """
+    Calculates the total revenue of the dates between start_date and end_date (inclusive).
+    With a date index this takes two binary searches instead of a scan.
+    """
+    index = _date_index(file_path)
+    if index is not None:
+        total = index_revenue_between(index, start_date, end_date)
+    else:
+        total = sales_trend(file_path, chunksize, start_date, end_date, structured=True)['data'].sum()
+    return _output(_revenue_between_result(total, start_date, end_date), structured)
+
+def total_sales_by_region(file_path, region, chunksize=None, structured=False):
     """
     Calculates the total sales (revenue) for a specific region.
     """
-    df = pd.read_csv(file_path)
-    filtered = df[df['Region'].str.lower() == region.lower()]
-    if filtered.empty:
-        return f"No sales data found for region: {region}"
-    total_sales = filtered['Revenue'].sum()
-    return f"Total sales in region '{region}': ₹{total_sales}"
+    matched_rows, total_sales = _aggregate(file_path, ['Region', 'Revenue'],
+                                           _region_revenue(region), _add_tuples, chunksize,
+                                           _cube_region_revenue(region), {'regions': {region.lower()}})
+    return _output(_region_total_result(matched_rows, total_sales, region), structured)
+
+# Reports that only need per-product totals share one group-by pass
+_product_reports = ('summarize_sales', 'get_top_product', 'average_sales')
+_region_reports = ('filter_by_region', 'total_sales_by_region')
+_date_reports = ('sales_trend', 'revenue_between')
+_page_params = ('limit', 'offset', 'columns')
+_trend_params = ('start_date', 'end_date', 'granularity')
+_report_columns = {
+    'summarize_sales': {'Product', 'Units_Sold', 'Revenue'},
+    'get_top_product': {'Product', 'Units_Sold', 'Revenue'},
+    'average_sales': {'Product', 'Units_Sold', 'Revenue'},
+    'sales_trend': {'Date', 'Revenue'},
+    'revenue_between': {'Date', 'Revenue'},
+    'total_sales_by_region': {'Region', 'Revenue'},
+}
+_all_columns = ['Product', 'Region', 'Date', 'Units_Sold', 'Revenue']
+
+def _batch_columns(parsed):
+    if any(name == 'filter_by_region' for name, _ in parsed):
+        return None
+    needed = set().union(*(_report_columns[name] for name, _ in parsed))
+    return [column for column in _all_columns if column in needed]
+
+def _report_params(report):
+    if isinstance(report, str):
+        return report, {}
+    return report
+
+def _parse_reports(reports):
+    parsed = []
+    for report in reports:
+        name, params = _report_params(report)
+        if name not in tool_functions:
+            raise ValueError(f"Unknown sales tool: {name}")
+        region = params.get('region') if name in _region_reports else None
+        if name in _region_reports and region is None:
+            raise ValueError(f"Tool '{name}' needs a region")
+        parsed.append((name, region))
+    return parsed
+
+def _batch_parts(parsed, keeps, df):
+    names = {name for name, _ in parsed}
+    parts = {}
+    if names.intersection(_product_reports):
+        revenue_per_unit = df['Revenue'] / df['Units_Sold']
+        parts['product'] = pd.DataFrame({
+            'Units_Sold': df['Units_Sold'],
+            'Revenue': df['Revenue'],
+            'sum': revenue_per_unit,
+            'count': revenue_per_unit,
+        }).groupby(df['Product'], observed=True).agg({
+            'Units_Sold': 'sum', 'Revenue': 'sum', 'sum': 'sum', 'count': 'count',
+        })
+    if names.intersection(_date_reports):
+        parts['date'] = _revenue_by_date(df)
+    if 'total_sales_by_region' in names:
+        # Group by the stored region first, then fold case on the few distinct values
+        totals = df['Revenue'].groupby(df['Region'], observed=True).agg(['size', 'sum'])
+        parts['region'] = totals.groupby(totals.index.astype(str).str.lower(), observed=True).sum()
+    for name, region in parsed:
+        if name == 'filter_by_region':
+            parts[('rows', region.lower())] = _page_in_region(region, keeps[region.lower()], df)
+    return parts
+
+def _cube_batch_parts(parsed, cube):
+    names = {name for name, _ in parsed}
+    parts = {}
+    if names.intersection(_product_reports):
+        parts['product'] = cube.groupby('Product', observed=True)[
+            ['Units_Sold', 'Revenue', 'Revenue_per_Unit_Sum', 'Revenue_per_Unit_Count']
+        ].sum().set_axis(['Units_Sold', 'Revenue', 'sum', 'count'], axis=1)
+    if names.intersection(_date_reports):
+        parts['date'] = _revenue_by_date(cube)
+    if 'total_sales_by_region' in names:
+        totals = cube.groupby('Region', observed=True)[['Rows', 'Revenue']].sum()
+        parts['region'] = totals.groupby(totals.index.astype(str).str.lower(), observed=True).sum()
+    return parts
+
+def _batch_partial(parsed, keeps):
+    return functools.partial(_batch_parts, parsed, keeps)
+
+def _cube_batch_partial(parsed):
+    return functools.partial(_cube_batch_parts, parsed)
+
+def _combine_batch(keeps, total, part):
+    return {
+        key: _add_pages(keeps[key[1]], total[key], part[key]) if isinstance(key, tuple)
+        else _add_grouped(total[key], part[key])
+        for key in total
+    }
+
+def _batch_keeps(reports):
+    # Rows of a region are gathered once for all of its pages, up to the furthest one
+    keeps = {}
+    for name, params in map(_report_params, reports):
+        if name == 'filter_by_region':
+            keep = _page_options(*(params.get(key) for key in _page_params))[0]
+            region = params['region'].lower()
+            keeps[region] = None if keep is None or keeps.get(region, 0) is None else max(keep, keeps.get(region, 0))
+    return keeps
+
+def _report_result(name, region, params, parts):
+    if name == 'summarize_sales':
+        return _summary_result(parts['product'][['Units_Sold', 'Revenue']])
+    if name == 'get_top_product':
+        return _top_product_result(parts['product']['Revenue'])
+    if name == 'average_sales':
+        return _average_result(parts['product'])
+    if name == 'sales_trend':
+        start_date, end_date, granularity = (params.get(key) for key in _trend_params)
+        granularity = granularity or 'D'
+        if 'index' in parts:
+            trend = index_trend(parts['index'], start_date, end_date, granularity)
+        else:
+            trend = _resample_trend(_trend_between(parts['date'], start_date, end_date), granularity)
+        return _trend_result(trend, start_date, end_date, granularity)
+    if name == 'revenue_between':
+        start_date, end_date = params.get('start_date'), params.get('end_date')
+        if 'index' in parts:
+            total = index_revenue_between(parts['index'], start_date, end_date)
+        else:
+            total = _trend_between(parts['date'], start_date, end_date).sum()
+        return _revenue_between_result(total, start_date, end_date)
+    if name == 'filter_by_region':
+        keep, limit, offset, columns = _page_options(*(params.get(key) for key in _page_params))
+        rows, matched_rows, total_units, total_revenue = parts[('rows', region.lower())]
+        page = (rows if keep is None else rows.head(keep), matched_rows, total_units, total_revenue)
+        return _region_page_result(page, region, offset, limit, columns)
+    totals = parts['region']
+    if region.lower() in totals.index:
+        matched_rows, total_sales = totals.loc[region.lower()]
+        return _region_total_result(matched_rows, total_sales, region)
+    return _region_total_result(0, 0, region)
+
+def _report_keys(parsed, reports):
+    # The first report of a tool is keyed by its name, later ones by their arguments
+    keys = []
+    seen = set()
+    names = set()
+    for (name, region), report in zip(parsed, reports):
+        params = _report_params(report)[1]
+        arguments = [region] if region is not None else []
+        arguments += [f"{param}={params[param]}" for param in sorted(params)
+                      if param not in ('file', 'region') and params[param] is not None]
+        full_key = f"{name}[{', '.join(arguments)}]"
+        if full_key in seen:
+            raise ValueError(f"Report requested twice: {full_key}")
+        seen.add(full_key)
+        keys.append(full_key if name in names else name)
+        names.add(name)
+    return keys
+
+def run_reports(file_path, reports, chunksize=None, structured=False):
+    """
+    Runs several sales tools from a single load of the file, sharing group-by passes.
+    Each report is a tool name or a (tool name, parameters) pair such as
+    ('total_sales_by_region', {'region': 'North'}); filter_by_region also takes
+    limit, offset and columns, and sales_trend start_date, end_date and granularity.
+    Returns the tool outputs (or structured results) keyed by tool name; a tool
+    requested more than once is keyed by its arguments after its first occurrence,
+    e.g. 'sales_trend[granularity=M]' or 'filter_by_region[North, offset=50]'.
+    Requesting the same report twice raises ValueError. Date reports answer from
+    the date index when one was built, like sales_trend and revenue_between.
+    """
+    parsed = _parse_reports(reports)
+    keeps = _batch_keeps(reports)
+    prune = None
+    if all(name in _region_reports for name, _ in parsed):
+        prune = {'regions': {region.lower() for _, region in parsed}}
+    index = _date_index(file_path) if any(name in _date_reports for name, _ in parsed) else None
+    scanned = [(name, region) for name, region in parsed if index is None or name not in _date_reports]
+    # filter_by_region lists raw rows, so it never answers from the cube
+    row_reports = [(name, region) for name, region in scanned if name == 'filter_by_region']
+    cube_reports = [(name, region) for name, region in scanned if name != 'filter_by_region']
+    parts = {}
+    if cube_reports:
+        parts = _aggregate(file_path, _batch_columns(scanned), _batch_partial(scanned, keeps),
+                           functools.partial(_combine_batch, keeps), chunksize,
+                           _cube_batch_partial(cube_reports), prune)
+    if row_reports and not parts.keys() >= {('rows', region.lower()) for _, region in row_reports}:
+        parts.update(_aggregate(file_path, None, _batch_partial(row_reports, keeps),
+                                functools.partial(_combine_batch, keeps), chunksize, prune=prune))
+    if index is not None:
+        parts['index'] = index
+    results = {}
+    for (name, region), report, key in zip(parsed, reports, _report_keys(parsed, reports)):
+        result = _report_result(name, region, _report_params(report)[1], parts)
+        results[key] = _output(result, structured)
+    return results
+
+tool_functions = {
+    "summarize_sales": summarize_sales,
+    "get_top_product": get_top_product,
+    "average_sales": average_sales,
+    "filter_by_region": filter_by_region,
+    "sales_trend": sales_trend,
+    "total_sales_by_region": total_sales_by_region,
+    "revenue_between": revenue_between,
+}
@@ -0,0 +1,30 @@
+from concurrent.futures import Future
+import agent_protocol
+import tool_cache
+
+def test_tool_calls_accept_one_tool_or_a_list():
+    assert agent_protocol.tool_calls({'tool': 'summarize_sales', 'parameters': None}) == [('summarize_sales', {})]
+    calls = agent_protocol.tool_calls({'tools': [{'tool': 'a', 'parameters': {'x': 1}}, 'junk', {'tool': 'b'}]})
+    assert calls == [('a', {'x': 1}), ('b', {})]
+
+def test_speculation_is_cancelled_when_the_calls_differ():
+    started = []
+
+    def start(calls):
+        started.append(Future())
+        return started[-1:]
+
+    speculation = agent_protocol.SpeculativeTools(start, lambda tool_name: tool_name != 'write')
+    speculation.on_partial_json({'tool': 'write', 'parameters': {}})
+    assert speculation.calls is None
+    speculation.on_partial_json({'tool': 'summarize_sales', 'parameters': {}})
+    assert speculation.pending_for([('summarize_sales', {'x': 1})]) is None
+    assert started[0].cancelled()
+
+def test_only_region_tools_are_keyed_by_the_default_region():
+    tool_cache.clear_cache()
+    agent_protocol.run_sales_tool('summarize_sales', {}, 'sales_data.csv', 'North')
+    agent_protocol.run_sales_tool('summarize_sales', {'region': 'South'}, 'sales_data.csv', 'North')
+    north = agent_protocol.run_sales_tool('total_sales_by_region', {}, 'sales_data.csv', 'North')
+    assert tool_cache.cache_info()['hits'] == 1
+    assert north == "Total sales in region 'North': ₹189000"
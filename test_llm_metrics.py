@@ -0,0 +1,18 @@
+import llm_metrics
+
+def test_nearest_rank_percentiles():
+    assert llm_metrics._percentile(range(1, 6), 0.5) == 3
+    assert llm_metrics._percentile(range(1, 10), 0.5) == 5
+    assert llm_metrics._percentile(range(1, 101), 0.95) == 95
+    assert llm_metrics._percentile(range(1, 21), 0.95) == 19
+    assert llm_metrics._percentile([7], 0.95) == 7
+
+def test_record_reads_ollama_timings():
+    final = {"done": True, "eval_count": 40, "eval_duration": 2_000_000_000,
+             "prompt_eval_count": 10, "prompt_eval_duration": 500_000_000}
+    call = llm_metrics.record({"model": "m", "prompt": "hello"}, final, 2.5, 0.6, label="test")
+    assert call["eval_seconds"] == 2.0
+    assert call["tokens_per_sec"] == 20.0
+    assert call["prompt_tokens_per_sec"] == 20.0
+    assert call["prompt_chars"] == 5
+    assert llm_metrics.calls()[-1] is call
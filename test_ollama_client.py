@@ -0,0 +1,32 @@
+from ollama_client import JsonObjectParser, find_json_object
+
+def feed_in_pieces(parser, text, size=3):
+    result = None
+    for i in range(0, len(text), size):
+        result = parser.feed(text[i:i + size])
+    return result
+
+def test_object_split_across_chunks():
+    text = 'Sure: {"tool": "add", "parameters": {"a": 1, "b": "}"}, "next_step": "x"} and more {"b": 2}'
+    parser = JsonObjectParser()
+    assert feed_in_pieces(parser, text) == {"tool": "add", "parameters": {"a": 1, "b": "}"}, "next_step": "x"}
+
+def test_braces_in_strings_and_escapes_are_ignored():
+    assert find_json_object('{"a": "{\\"}", "b": [1, {"c": 2}]}') == {"a": '{"}', "b": [1, {"c": 2}]}
+
+def test_balanced_but_invalid_text_is_skipped():
+    assert find_json_object('{not json} {"ok": true}') == {"ok": True}
+
+def test_incomplete_object_returns_none():
+    assert find_json_object('{"tool": "add", "parameters": {') is None
+
+def test_fields_grow_as_top_level_values_complete():
+    parser = JsonObjectParser()
+    seen = []
+    text = '{"tool": "a, b", "parameters": {"x": 1, "y": [1, 2]}, "next_step": "go"}'
+    for i in range(0, len(text), 4):
+        count = len(parser.fields)
+        parser.feed(text[i:i + 4])
+        if len(parser.fields) > count:
+            seen.append(list(parser.fields))
+    assert seen == [["tool"], ["tool", "parameters"], ["tool", "parameters", "next_step"]]
@@ -0,0 +1,25 @@
+from prompt_builder import PromptBuilder
+
+def test_render_joins_prefix_history_suffix_and_message():
+    builder = PromptBuilder("P\n", "\nS\n")
+    builder.add_step("q1", "a1")
+    assert builder.render("now") == "P\nStep 1:\nUser: q1\nAgent: a1\n\nS\nnow\n"
+
+def test_history_stays_within_budget_and_keeps_recent_steps_whole():
+    builder = PromptBuilder("", "", history_token_budget=300, keep_recent_steps=2, compacted_step_chars=50)
+    for i in range(10):
+        builder.add_step(f"q{i}", "x" * 400)
+    history = builder.history_text()
+    assert builder.history_tokens <= 300
+    assert history.startswith("[")
+    assert f"Step 10:\nUser: q9\nAgent: {'x' * 400}\n" in history
+    assert "Step 1:" not in history
+
+def test_old_steps_are_shortened_before_they_are_dropped():
+    builder = PromptBuilder("", "", history_token_budget=200, keep_recent_steps=1, compacted_step_chars=20)
+    for i in range(3):
+        builder.add_step(f"q{i}", "y" * 300)
+    history = builder.history_text()
+    assert builder.history_tokens <= 200
+    assert history.startswith("Step 1:\nUser: q0\nAgent: " + "y" * 20 + "... [280 chars compacted]\n")
+    assert history.endswith("Step 3:\nUser: q2\nAgent: " + "y" * 300 + "\n")
@@ -0,0 +1,60 @@
+import pytest
+from sales_tools import run_reports
+
+file = 'sales_data.csv'
+
+def test_repeated_tools_get_distinct_keys():
+    results = run_reports(file, [
+        ('sales_trend', {'granularity': 'W'}),
+        ('sales_trend', {'granularity': 'M'}),
+        ('filter_by_region', {'region': 'North', 'limit': 1}),
+        ('filter_by_region', {'region': 'North', 'limit': 1, 'offset': 1}),
+        ('filter_by_region', {'region': 'North', 'limit': 1, 'offset': 2}),
+    ], structured=True)
+    assert list(results) == [
+        'sales_trend',
+        'sales_trend[granularity=M]',
+        'filter_by_region',
+        'filter_by_region[North, limit=1, offset=1]',
+        'filter_by_region[North, limit=1, offset=2]',
+    ]
+    assert results['sales_trend']['params']['granularity'] == 'W'
+    assert results['sales_trend[granularity=M]']['params']['granularity'] == 'M'
+
+def test_same_report_twice_raises():
+    with pytest.raises(ValueError):
+        run_reports(file, [('total_sales_by_region', {'region': 'North'})] * 2)
+
+def test_revenue_between_matches_the_trend():
+    start_date, end_date = '2025-01-05', '2025-01-20'
+    results = run_reports(file, [('revenue_between', {'start_date': start_date, 'end_date': end_date}),
+                                 ('sales_trend', {'start_date': start_date, 'end_date': end_date})],
+                          structured=True)
+    assert results['revenue_between']['data']['revenue'] == results['sales_trend']['data'].sum()
+
+def test_unknown_granularity_names_the_allowed_values():
+    with pytest.raises(ValueError, match="'D', 'W' or 'M'|D, day"):
+        run_reports(file, [('sales_trend', {'granularity': 'Q'})])
+
+def test_streamed_pages_keep_only_the_rows_shown(monkeypatch):
+    import sales_tools
+    kept = []
+    add_pages = sales_tools._add_pages
+
+    def spy(keep, total, part):
+        rows = add_pages(keep, total, part)
+        kept.append(len(rows[0]))
+        return rows
+
+    monkeypatch.setattr(sales_tools, '_add_pages', spy)
+    results = run_reports(file, [('filter_by_region', {'region': 'North', 'limit': 1}),
+                                 ('filter_by_region', {'region': 'North', 'limit': 1, 'offset': 2})],
+                          chunksize=2, structured=True)
+    assert kept and max(kept) <= 3
+    assert len(results['filter_by_region']['data']) == 1
+    assert results['filter_by_region']['meta']['matched_rows'] == 6
+
+@pytest.mark.parametrize('params', [{'limit': -1}, {'offset': -1}, {'columns': 'Prodcut'}])
+def test_bad_page_arguments_raise(params):
+    with pytest.raises(ValueError):
+        run_reports(file, [('filter_by_region', {'region': 'North', **params})])
@@ -0,0 +1,54 @@
+from generate_sales_data import generate_sales_data
+from sales_cube import build_cube, load_cube, drop_cube, clear_cache as clear_cubes
+from sales_loader import load_sales, region_mask, clear_cache
+from sales_tools import total_sales_by_region, summarize_sales, run_reports
+
+def totals(df):
+    return df.groupby('Product', observed=True)[['Units_Sold', 'Revenue']].sum().sort_index()
+
+def test_region_total_from_cube_counts_rows(tmp_path):
+    clear_cache()
+    path = generate_sales_data(str(tmp_path / 'sales.csv'), 5000)
+    rows = int(region_mask(load_sales(path), 'North').sum())
+    build_cube(path)
+    result = total_sales_by_region(path, 'North', structured=True)['data']
+    report = run_reports(path, [('total_sales_by_region', {'region': 'North'})], structured=True)
+    assert result['matched_rows'] == rows
+    assert report['total_sales_by_region']['data']['matched_rows'] == rows
+
+def test_cube_answers_match_the_raw_rows(tmp_path):
+    clear_cache()
+    path = generate_sales_data(str(tmp_path / 'sales.csv'), 3000)
+    raw = summarize_sales(path)
+    build_cube(path)
+    assert summarize_sales(path) == raw
+    assert len(load_cube(path)) < 3000
+
+def test_cube_folds_in_appended_rows(tmp_path):
+    clear_cache()
+    path = generate_sales_data(str(tmp_path / 'sales.csv'), 2000)
+    build_cube(path)
+    with open(path, 'a', newline='') as f:
+        f.write('Chair,North,2025-01-01,5,1000\nNew Product,Mars,2025-12-31,1,7\n')
+    clear_cache()
+    cube = load_cube(path)
+    assert cube['Rows'].sum() == 2002
+    assert totals(cube).loc['New Product', 'Revenue'] == 7
+    assert totals(cube).equals(totals(load_sales(path)))
+    # The refreshed cube was persisted, so a new process sees the appended rows too
+    clear_cubes()
+    assert load_cube(path)['Rows'].sum() == 2002
+
+def test_cube_is_rebuilt_after_a_rewrite(tmp_path):
+    clear_cache()
+    path = generate_sales_data(str(tmp_path / 'sales.csv'), 2000)
+    build_cube(path)
+    generate_sales_data(path, 500, seed=7)
+    assert load_cube(path)['Rows'].sum() == 500
+    assert totals(load_cube(path)).equals(totals(load_sales(path)))
+
+def test_dropped_cube_is_not_used(tmp_path):
+    path = generate_sales_data(str(tmp_path / 'sales.csv'), 100)
+    build_cube(path)
+    drop_cube(path)
+    assert load_cube(path) is None
@@ -0,0 +1,62 @@
+import pytest
+from generate_sales_data import generate_sales_data
+from sales_index import build_date_index, load_date_index, index_trend, index_revenue_between, clear_cache as clear_indexes
+from sales_loader import clear_cache
+import sales_tools
+from sales_tools import sales_trend, revenue_between, run_reports
+
+@pytest.fixture
+def sales_file(tmp_path):
+    clear_cache()
+    return generate_sales_data(str(tmp_path / 'sales.csv'), 3000, days=90)
+
+@pytest.mark.parametrize('granularity', ['D', 'W', 'M'])
+def test_index_trend_matches_the_scan(sales_file, granularity):
+    scanned = sales_trend(sales_file, start_date='2025-01-10', end_date='2025-03-05',
+                          granularity=granularity, structured=True)['data']
+    build_date_index(sales_file)
+    indexed = sales_trend(sales_file, start_date='2025-01-10', end_date='2025-03-05',
+                          granularity=granularity, structured=True)['data']
+    assert indexed.index.equals(scanned.index)
+    assert (indexed.values == scanned.values).all()
+
+def test_index_revenue_between_matches_the_scan(sales_file):
+    scanned = revenue_between(sales_file, '2025-02-01', '2025-02-14', structured=True)['data']['revenue']
+    build_date_index(sales_file)
+    state = load_date_index(sales_file)
+    assert index_revenue_between(state, '2025-02-01', '2025-02-14') == scanned
+    assert index_revenue_between(state) == index_trend(state).sum()
+
+def test_index_folds_in_appended_rows(sales_file):
+    build_date_index(sales_file)
+    total = index_revenue_between(load_date_index(sales_file))
+    with open(sales_file, 'a', newline='') as f:
+        f.write('Chair,North,2025-06-01,1,250\n')
+    clear_indexes()
+    state = load_date_index(sales_file)
+    assert index_revenue_between(state) == total + 250
+    assert index_revenue_between(state, '2025-06-01', '2025-06-01') == 250
+
+def test_index_leaves_out_an_unterminated_row(sales_file):
+    build_date_index(sales_file)
+    total = index_revenue_between(load_date_index(sales_file))
+    with open(sales_file, 'a', newline='') as f:
+        f.write('Chair,North,2025-06-01,1,25')
+    assert index_revenue_between(load_date_index(sales_file)) == total
+    with open(sales_file, 'a', newline='') as f:
+        f.write('0\n')
+    assert index_revenue_between(load_date_index(sales_file)) == total + 250
+
+def test_run_reports_answers_date_reports_from_the_index(sales_file, monkeypatch):
+    reports = [('sales_trend', {'start_date': '2025-01-10', 'end_date': '2025-03-05', 'granularity': 'W'}),
+               ('revenue_between', {'start_date': '2025-02-01', 'end_date': '2025-02-14'})]
+    scanned = run_reports(sales_file, reports, structured=True)
+    build_date_index(sales_file)
+
+    def scan(*args, **kwargs):
+        raise AssertionError('scanned the file although a date index exists')
+
+    monkeypatch.setattr(sales_tools, '_aggregate', scan)
+    indexed = run_reports(sales_file, reports, structured=True)
+    assert (indexed['sales_trend']['data'].values == scanned['sales_trend']['data'].values).all()
+    assert indexed['revenue_between']['data'] == scanned['revenue_between']['data']
@@ -0,0 +1,63 @@
+import sales_tools
+from sales_loader import load_sales, clear_cache, is_cached
+from sales_tools import total_sales_by_region
+
+header = 'Product,Region,Date,Units_Sold,Revenue\n'
+rows = 'Chair,North,2025-01-01,2,500\nTable,South,2025-01-02,1,300\n'
+
+def write(path, text, mode='w'):
+    with open(path, mode, newline='') as f:
+        f.write(text)
+
+def test_half_written_row_is_left_out(tmp_path):
+    clear_cache()
+    path = str(tmp_path / 'sales.csv')
+    write(path, header + rows + 'Chair,No')
+    df = load_sales(path)
+    assert len(df) == 2
+    assert df['Revenue'].sum() == 800
+
+def test_row_with_cut_off_number_is_read_once_complete(tmp_path):
+    clear_cache()
+    path = str(tmp_path / 'sales.csv')
+    write(path, header + rows + 'Lamp,North,2025-01-03,1,5')
+    assert load_sales(path)['Revenue'].sum() == 800
+    write(path, '00\n', 'a')
+    df = load_sales(path)
+    assert len(df) == 3
+    assert df['Revenue'].sum() == 1300
+    assert total_sales_by_region(path, 'North', structured=True)['data']['total_revenue'] == 1000
+
+def test_appended_rows_are_added_to_the_cached_frame(tmp_path):
+    clear_cache()
+    path = str(tmp_path / 'sales.csv')
+    write(path, header + rows)
+    assert len(load_sales(path)) == 2
+    write(path, 'Desk,East,2025-01-04,3,900\n', 'a')
+    df = load_sales(path)
+    assert len(df) == 3
+    assert list(df['Product'].astype(str)) == ['Chair', 'Table', 'Desk']
+
+def test_large_revenue_is_not_wrapped(tmp_path):
+    clear_cache()
+    path = str(tmp_path / 'sales.csv')
+    write(path, header + 'Sofa,West,2025-01-05,1,3000000000\n')
+    assert load_sales(path)['Revenue'].iloc[0] == 3_000_000_000
+
+def test_parallel_workers_answer_from_a_cached_frame(tmp_path, monkeypatch):
+    clear_cache()
+    path = str(tmp_path / 'sales.csv')
+    write(path, header + rows)
+    monkeypatch.setattr(sales_tools, 'parallel_workers', 2)
+    monkeypatch.setattr(sales_tools, 'parallel_min_bytes', 1)
+
+    def fan_out(*args):
+        raise AssertionError('re-read a cached file in the process pool')
+
+    monkeypatch.setattr(sales_tools, '_aggregate_parallel', fan_out)
+    assert not is_cached(path)
+    assert total_sales_by_region(path, 'North', structured=True)['data']['total_revenue'] == 500
+    assert is_cached(path)
+    write(path, 'Desk,North,2025-01-04,3,900\n', 'a')
+    assert is_cached(path)
+    assert total_sales_by_region(path, 'North', structured=True)['data']['total_revenue'] == 1400
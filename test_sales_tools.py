@@ -1,5 +1,5 @@
 import json
-from sales_tools import summarize_sales, get_top_product, average_sales, filter_by_region, sales_trend, total_sales_by_region
+from sales_tools import summarize_sales, get_top_product, average_sales, filter_by_region, sales_trend, total_sales_by_region, revenue_between, run_reports
 from rich.console import Console, Group
 from rich.panel import Panel
 from rich.table import Table
@@ -16,6 +16,7 @@ tool_functions = {
     "filter_by_region": (filter_by_region, {"file": file, "region": region}),
     "sales_trend": (sales_trend, {"file": file}),
     "total_sales_by_region": (total_sales_by_region, {"file": file, "region": region}),
+    "revenue_between": (revenue_between, {"file": file}),
 }
 
 # Load tool descriptions
@@ -44,14 +45,14 @@ def tool_panel(tool_name, description, param_names, params, result, color):
 
 colors = ["green", "blue", "magenta", "yellow", "cyan"]
 
+# Compute every report from a single load of the sales file
+results = run_reports(file, [(tool["name"], tool_functions[tool["name"]][1]) for tool in tools_desc])
+
 for idx, tool in enumerate(tools_desc):
     name = tool["name"]
     desc = tool["description"]
     param_names = tool["parameters"]
     params = tool_functions[name][1]
-    func = tool_functions[name][0]
-    # Prepare arguments for the function
-    func_args = [params[p] for p in param_names]
-    result = func(*func_args)
+    result = results[name]
     color = colors[idx % len(colors)]
     console.print(tool_panel(name, desc, param_names, params, result, color))
@@ -0,0 +1,19 @@
+import asyncio
+from types import SimpleNamespace
+import tool_cache
+
+def test_mcp_error_result_is_not_cached():
+    tool_cache.clear_cache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return SimpleNamespace(isError=len(calls) == 1, content='result')
+
+    first = asyncio.run(tool_cache.amemoize('add', {'a': 1}, compute))
+    assert first.isError
+    second = asyncio.run(tool_cache.amemoize('add', {'a': 1}, compute))
+    assert not second.isError
+    third = asyncio.run(tool_cache.amemoize('add', {'a': 1}, compute))
+    assert third is second
+    assert len(calls) == 2
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from sales_loader import file_fingerprint, list_partitions
+
+# Tool results kept in memory; the least recently used are evicted first
+max_entries = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+def _normalise(value):
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {str(key).strip(): _normalise(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalise(item) for item in value]
+    return value
+
+def input_fingerprint(file_path):
+    """
+    Returns a value that changes whenever the sales file, or any partition of a
+    partitioned sales directory, changes.
+    """
+    if os.path.isdir(file_path):
+        return [file_fingerprint(path) for path, _ in list_partitions(file_path)]
+    return file_fingerprint(file_path)
+
+def cache_key(tool_name, params, file_path=None):
+    """
+    Returns the cache key of a tool call: the tool name, its parameters with
+    surrounding whitespace and None values removed, and the fingerprint of its input file.
+    """
+    fingerprint = input_fingerprint(file_path) if file_path is not None else None
+    return json.dumps([tool_name, _normalise(params), fingerprint], sort_keys=True, default=str)
+
+def memoize(tool_name, params, compute, file_path=None):
+    """
+    Returns the result of a pure tool call, calling compute() only when the same
+    tool has not yet run with the same parameters on the current version of file_path.
+    Exceptions raised by compute are not cached.
+    """
+    try:
+        key = cache_key(tool_name, params, file_path)
+    except OSError:
+        # A missing input file is reported by the tool itself
+        return compute()
+    found, result = _lookup(key)
+    if found:
+        return result
+    result = compute()
+    _store(key, result)
+    return result
+
+def _lookup(key):
+    global _hits, _misses
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _hits += 1
+            return True, _cache[key]
+        _misses += 1
+        return False, None
+
+def _store(key, result):
+    with _lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > max_entries:
+            _cache.popitem(last=False)
+
+async def amemoize(tool_name, params, compute, file_path=None):
+    """
+    Async version of memoize for a compute() that returns an awaitable, e.g. an MCP tool call.
+    MCP tools report failures as a result with isError set, and those are not cached either.
+    """
+    key = cache_key(tool_name, params, file_path)
+    found, result = _lookup(key)
+    if found:
+        return result
+    result = await compute()
+    if not getattr(result, "isError", False):
+        _store(key, result)
+    return result
+
+def cache_info():
+    """
+    Returns hit/miss counts and the number of cached tool results.
+    """
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "entries": len(_cache), "max_entries": max_entries}
+
+def format_cache_info():
+    """
+    Returns the cache counters as one line for the agents to print.
+    """
+    info = cache_info()
+    return f"Tool cache: {info['hits']} hits, {info['misses']} misses, {info['entries']} results cached"
+
+def clear_cache():
+    """
+    Empties the tool result cache and resets its counters.
+    """
+    global _hits, _misses
+    with _lock:
+        _cache.clear()
+        _hits = _misses = 0